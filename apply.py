@@ -3,6 +3,7 @@
 from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.keys import Keys
+import functools
 import os # to get the resume file
 import time # to sleep
 import get_links
@@ -40,6 +41,73 @@ JOB_APP = {
     "university": "MIT" # if only o.O
 }
 
+# set a text area's value and fire the events a typed value would
+PASTE_SCRIPT = """
+arguments[0].value = arguments[1];
+arguments[0].dispatchEvent(new Event('input', {bubbles: true}));
+arguments[0].dispatchEvent(new Event('change', {bubbles: true}));
+"""
+
+@functools.lru_cache
+def resume_text(path):
+    """read the resume text file once per batch"""
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+# per-ATS field maps: name -> (alternative xpaths, action, JOB_APP key to type)
+# all alternatives for a field are resolved together, so a miss costs nothing extra
+GREENHOUSE_FIELDS = {
+    "linkedin": (["//label[contains(.,'LinkedIn')]/following::input[1]",
+                  "//label[contains(.,'Linkedin')]/following::input[1]"], 'type', 'linkedin'),
+    "grad_year": (["//select/option[text()='2021']"], 'click', None),
+    "university": (["//select/option[contains(.,'Harvard')]"], 'click', None),
+    "degree": (["//select/option[contains(.,'Bachelor')]"], 'click', None),
+    "major": (["//select/option[contains(.,'Computer Science')]"], 'click', None),
+    "website": (["//label[contains(.,'Website')]/following::input[1]"], 'type', 'website'),
+    "work_authorization": (["//select/option[contains(.,'any employer')]"], 'click', None),
+}
+
+LEVER_FIELDS = {
+    "linkedin": (["//*[@name='urls[LinkedIn]']"], 'type', 'linkedin'),
+    "twitter": (["//*[@name='urls[Twitter]']"], 'type', 'twitter'),
+    "github": (["//*[@name='urls[Github]']", "//*[@name='urls[GitHub]']"], 'type', 'github'),
+    "portfolio": (["//*[@name='urls[Portfolio]']"], 'type', 'website'),
+}
+
+LEVER_SOURCE_FIELDS = {
+    "source": (["//select/option[text()='Glassdoor']"], 'click', None),
+}
+
+# resolve every field in one round trip, taking the first alternative in document order
+FIND_SCRIPT = """
+const found = {};
+for (const [name, xpaths] of Object.entries(arguments[0])) {
+    found[name] = document.evaluate(
+        xpaths.join(' | '), document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+}
+return found;
+"""
+
+def fill_fields(driver, fields):
+    """fill a per-ATS field map and report which fields matched"""
+    found = driver.execute_script(FIND_SCRIPT, {name: xpaths for name, (xpaths, _, _) in fields.items()})
+
+    matched = []
+    for name, (xpaths, action, key) in fields.items():
+        element = found.get(name)
+        if element is None:
+            continue
+        if action == 'click':
+            element.click()
+        else:
+            element.send_keys(JOB_APP[key])
+        matched.append(name)
+
+    skipped = [name for name in fields if name not in matched]
+    print(f"matched: {', '.join(matched) or 'none'} | skipped: {', '.join(skipped) or 'none'}")
+    return matched
+
 # Greenhouse has a different application form structure than Lever, and thus must be parsed differently
 def greenhouse(driver):
 
@@ -65,55 +133,11 @@ def greenhouse(driver):
     driver.find_element_by_css_selector("[data-source='paste']").click()
     resume_zone = driver.find_element_by_id('resume_text')
     resume_zone.click()
-    with open(JOB_APP['resume_textfile']) as f:
-        lines = f.readlines() # add each line of resume to the text area
-        for line in lines:
-            resume_zone.send_keys(line.decode('utf-8'))
-
-    # add linkedin
-    try:
-        driver.find_element_by_xpath("//label[contains(.,'LinkedIn')]").send_keys(JOB_APP['linkedin'])
-    except NoSuchElementException:
-        try:
-            driver.find_element_by_xpath("//label[contains(.,'Linkedin')]").send_keys(JOB_APP['linkedin'])
-        except NoSuchElementException:
-            pass
-
-    # add graduation year
-    try:
-        driver.find_element_by_xpath("//select/option[text()='2021']").click()
-    except NoSuchElementException:
-        pass
-
-    # add university
-    try:
-        driver.find_element_by_xpath("//select/option[contains(.,'Harvard')]").click()
-    except NoSuchElementException:
-        pass
-
-    # add degree
-    try:
-        driver.find_element_by_xpath("//select/option[contains(.,'Bachelor')]").click()
-    except NoSuchElementException:
-        pass
-
-    # add major
-    try:
-        driver.find_element_by_xpath("//select/option[contains(.,'Computer Science')]").click()
-    except NoSuchElementException:
-        pass
+    # set the whole resume in one round trip instead of typing it line by line
+    driver.execute_script(PASTE_SCRIPT, resume_zone, resume_text(JOB_APP['resume_textfile']))
 
-    # add website
-    try:
-        driver.find_element_by_xpath("//label[contains(.,'Website')]").send_keys(JOB_APP['website'])
-    except NoSuchElementException:
-        pass
-
-    # add work authorization
-    try:
-        driver.find_element_by_xpath("//select/option[contains(.,'any employer')]").click()
-    except NoSuchElementException:
-        pass
+    # optional fields (linkedin, education, website, work authorization)
+    fill_fields(driver, GREENHOUSE_FIELDS)
 
     driver.find_element_by_id("submit_app").click()
 
@@ -132,16 +156,7 @@ def lever(driver):
     driver.find_element_by_name('org').send_keys(JOB_APP['org'])
 
     # socials
-    driver.find_element_by_name('urls[LinkedIn]').send_keys(JOB_APP['linkedin'])
-    driver.find_element_by_name('urls[Twitter]').send_keys(JOB_APP['twitter'])
-    try: # try both versions
-        driver.find_element_by_name('urls[Github]').send_keys(JOB_APP['github'])
-    except NoSuchElementException:
-        try:
-            driver.find_element_by_name('urls[GitHub]').send_keys(JOB_APP['github'])
-        except NoSuchElementException:
-            pass
-    driver.find_element_by_name('urls[Portfolio]').send_keys(JOB_APP['website'])
+    fill_fields(driver, LEVER_FIELDS)
 
     # add university
     try:
@@ -153,11 +168,7 @@ def lever(driver):
         pass
 
     # add how you found out about the company
-    try:
-        driver.find_element_by_class_name('application-dropdown').click()
-        search = driver.find_element_by_xpath("//select/option[text()='Glassdoor']").click()
-    except NoSuchElementException:
-        pass
+    fill_fields(driver, LEVER_SOURCE_FIELDS)
 
     # submit resume last so it doesn't auto-fill the rest of the form
     # since Lever has a clickable file-upload, it's easier to pass it into the webpage
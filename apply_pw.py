@@ -1,24 +1,27 @@
 #!/usr/bin/env python3
 
+import asyncio
 import json
 import re
-import requests
-import requests_cache
 import time
 import typer
-from bs4 import BeautifulSoup
+from browser_pool import ContextPool, lease_page
 from contextlib import suppress
 from decouple import config, UndefinedValueError
-from icecream import ic
+from export_store import ExportStore
+from export_stream import ats, follow_export, latest_export, read_export
+from form_engine import Field, fill_form
+from har import har_step, HarSession
+from listing_cache import listing_key
 from pathlib import Path
-from playwright.sync_api import sync_playwright, TimeoutError
+from playwright.async_api import async_playwright, Error, TimeoutError
+from timing import span, timed
 
 # env vars
 url = config(
     'URL',
     default='https://www.glassdoor.com/profile/login_input.htm'
 )
-headless_toggle = config('HEADLESS', default=False, cast=bool)  # default is False
 username = config('USERNAME', default='spiritualized@gmail.com')
 password = config('PASSWORD', default='correcthorsebatterystaple')
 first_name = config('FIRST_NAME', default='Yosemite')
@@ -41,28 +44,72 @@ grad_month = config('GRAD_MONTH')
 grad_year = config('GRAD_YEAR')
 university = config('UNIVERSITY')
 
-# dictionary of form fields
+# form fields for each Indeed Easy Apply step (see form_engine.Field)
 form_fields = {
-    "input-firstName": first_name,
-    "input-lastName": last_name,
-    "Phone number": phone,
-    "input-email": email,
-    "resumeUploadCard": str(Path(resume).resolve()),
-    "input-q_.*": zip_code,
-    "Country": country,
-    "United States Citizen": "",
-    "I don't wish to answer": "",
-    "Don't recommend me for any jobs at other employers.": "",
-    "Continue": "",
-    "Review your application": "",
+    "contact-info": [
+        Field("first_name", "testid", "input-firstName", "fill", first_name),
+        Field("last_name", "testid", "input-lastName", "fill", last_name),
+        Field("phone", "label", "Phone number", "fill", phone),
+        Field("email", "testid", "input-email", "fill", email),
+        Field("continue", "button", "Continue", "click"),
+    ],
+    "resume": [
+        Field("resume", "testid", "resumeUploadCard.*", "upload", str(Path(resume).resolve())),
+        Field("continue", "button", "Continue", "click"),
+    ],
+    "questions": [
+        Field("zip_code", "testid", "input-q_.*", "fill", zip_code),
+        Field("country", "label", "Country", "select", country),
+        Field("us_citizen", "text", r"United States Citizen|\bUS\b", "check"),
+        Field("no_answer", "text", "I don't wish to answer", "check"),
+        Field("no_recommend", "text", "Don't recommend me for any jobs at other employers.", "check"),
+        Field("continue", "button", "Continue", "click"),
+        Field("review", "button", "Review your application", "click"),
+    ],
 }
 
-# get latest json export
-latest_export = max(Path('exports').glob('urls_*.json'))
+# Lever application form fields (cf. apply.LEVER_FIELDS); the resume goes last, since Lever
+# parses it to fill in fields that are still empty
+lever_fields = [
+    Field("name", "name", "name", "fill", f"{first_name} {last_name}"),
+    Field("email", "name", "email", "fill", email),
+    Field("phone", "name", "phone", "fill", phone),
+    Field("org", "name", "org", "fill", org),
+    Field("linkedin", "name", "urls[LinkedIn]", "fill", linkedin),
+    Field("twitter", "name", "urls[Twitter]", "fill", twitter),
+    # spelled urls[Github] on some boards
+    Field("github", "css", '[name="urls[github]" i]', "fill", github),
+    Field("portfolio", "name", "urls[Portfolio]", "fill", website),
+    Field("resume", "name", "resume", "upload", str(Path(resume).resolve())),
+]
+
+# Easy Apply steps, keyed on the step url
+# * https://m5.apply.indeed.com/beta/indeedapply/form/contact-info
+# * https://m5.apply.indeed.com/beta/indeedapply/form/resume
+# * https://m5.apply.indeed.com/beta/indeedapply/form/questions/1
+form_steps = [
+    (re.compile(r'/form/contact-info'), 'contact-info'),
+    (re.compile(r'/form/resume'), 'resume'),
+    (re.compile(r'/form/questions/\d+'), 'questions'),
+    (re.compile(r'/form/review'), 'review'),
+]
+
+# fall back to the DOM when the url doesn't give the step away
+step_probe = """
+() => {
+    if (document.querySelector('[data-testid="input-firstName"], [data-testid="input-email"]')) return 'contact-info';
+    if (document.querySelector('[data-testid^="resumeUploadCard"]')) return 'resume';
+    if (document.querySelector('[data-testid^="input-q_"]')) return 'questions';
+    return null;
+}
+"""
+max_steps = 12
+step_timeout = config('STEP_TIMEOUT', default=10, cast=int) * 1000
 
-# read in job listings from exports/urls_*.json
-with open(latest_export) as f:
-    urls = json.load(f)
+# batch apply settings
+apply_workers = config('APPLY_WORKERS', default=2, cast=int)
+pause_toggle = config('PAUSE', default=True, cast=bool)        # page.pause() for debugging
+submit_toggle = config('SUBMIT', default=False, cast=bool)      # click the final submit button, otherwise only fill the forms
 
 # set timeout (e.g., *.click(timeout=10000)))
 sec = 10
@@ -76,16 +123,47 @@ headers = {
     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/113.0'
 }
 
+# headers sent by the browser pages
+page_headers = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Max-Age': '3600',
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36'
+}
+
 
 def get_raw_html(url):
     """Get raw HTML from a given URL"""
 
+    import requests
+    import requests_cache
+
     with suppress(requests.exceptions.ConnectionError):
         with requests_cache.disabled():
             response = requests.get(url, headers=headers)
             return response.text
 
 
+def load_export(export=None):
+    """Read job listing URLs from an export, defaulting to the latest exports/urls_*"""
+
+    return [record['url'] for record in read_export(export)]
+
+
+def pending_urls(records, done):
+    """Return the URL of each export record not applied to yet, once per listing"""
+
+    urls = []
+    for record in records:
+        key = listing_key(record['url'], record.get('listing_id'))
+        if key in done or not ats(record['url']):
+            continue
+        done.add(key)
+        urls.append(record['url'])
+    return urls
+
+
 def job_prefs():
     """Prompt for job preferences if not set in .env file"""
 
@@ -104,94 +182,66 @@ def job_prefs():
 class Driver:
     """Driver class to handle all browser interactions"""
 
-    def __init__(self, playwright, url, *args, **kwargs):
+    def __init__(self, playwright, url, *args, pool=None, pause=pause_toggle, **kwargs):
         self.playwright = playwright
         self.url = url
+        self.pool = pool
+        self.pause = pause
         self.args = args
         self.kwargs = kwargs
+        self.har = HarSession(kwargs.get('action', 'run'), url, mode='')
 
 
-    def run(self):
-        headers = {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'GET',
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Max-Age': '3600',
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36'
-        }
-
-        options = {
-            "args": [
-                '--disable-blink-features=AutomationControlled',
-                '--disable-gpu',
-                '--disable-dev-shm-usage',
-                '--disable-setuid-sandbox',
-                '--no-first-run',
-                '--no-sandbox',
-                '--no-zygote',
-                '--ignore-certificate-errors',
-                '--disable-extensions',
-                '--disable-infobars',
-                '--disable-notifications',
-                '--disable-popup-blocking',
-                '--remote-debugging-port=9222'
-            ],
-            "headless": headless_toggle,
-            "slow_mo": 100,
-            "devtools": False,
-        }
-        browser = self.playwright.chromium.launch(**options)
-        state = Path("playwright/.auth/state.json")
-        if state.is_file():
-            context = browser.new_context(
-                viewport={"width":1280,"height":1400},
-                storage_state=state._str
-            )
-        else:
-            context = browser.new_context(
-                viewport={"width":1280,"height":1400}
-            )
-        page = context.new_page()
+    async def run(self):
+        # record or replay this flow's traffic when HAR_MODE is set
+        self.har = HarSession(self.kwargs.get('action', 'run'), self.url)
+
+        # launch a browser for this run unless one is shared across runs
+        async with lease_page(self.playwright, self.pool, self.har, headers=page_headers) as page:
+            return await self.dispatch(page)
 
-        page.set_default_timeout(timeout)
 
-        page.set_extra_http_headers(headers)
+    async def dispatch(self, page):
+        """Run the requested action on a leased page and return its result"""
 
-        page.goto(self.url)
+        page.set_default_timeout(timeout)
 
-        # save state (cookies, local storage, etc.)
-        context.storage_state(path=state._str)
+        with span('apply.goto'):
+            await page.goto(self.url)
 
         # run class methods
+        result = None
         if self.kwargs:
             if self.kwargs['action'] == 'login':
-                self.login(page)
+                result = await self.login(page)
             elif self.kwargs['action'] == 'scrape_page':
-                self.scrape_page(page, self.url)
+                result = await self.scrape_page(page, self.url)
             elif self.kwargs['action'] == 'easy_apply':
-                self.easy_apply(page, self.url)
+                result = await self.easy_apply(page, self.url)
             elif self.kwargs['action'] == 'greenhouse':
-                self.greenhouse(page, self.url)
+                result = await self.greenhouse(page, self.url)
             elif self.kwargs['action'] == 'lever':
-                self.lever(page, self.url)
+                result = await self.lever(page, self.url)
 
         # ! pause for debugging
-        page.pause()
+        await self._pause(page)
+
+        return result
 
-        # close browser
-        # page.close()
-        # context.close()
-        # browser.close()
 
+    async def _pause(self, page):
+        if self.pause:
+            await page.pause()
 
-    def login(self, page):
+
+    async def login(self, page):
         """Helper method to give user time to log into Glassdoor"""
 
         print('Waiting for user to log in...')
 
         while True:
             try:
-                page.wait_for_selector("body.main.loggedIn.lang-en.en-US.gdGrid")
+                await page.wait_for_selector("body.main.loggedIn.lang-en.en-US.gdGrid")
                 timestamp = time.strftime("%H:%M:%S", time.localtime())
                 print(f"Logged in at {timestamp}")
             except TimeoutError:
@@ -215,148 +265,132 @@ class Driver:
     # await new_page.get_by_role("button", name="Review your application").click(timeout=5000)
     # await page.get_by_role("button", name="Submit application").click()
 
-    def scrape_page(self, page, url):
-        """Scrape a job listing page for application form fields"""
+    @timed('apply.open_application')
+    async def open_application(self, page, url):
+        """Open the Easy Apply form for a job listing and return its page"""
 
         # if playwright is not logged in, log in
         if not Path("playwright/.auth/state.json").is_file():
-            self.login(page)
+            await self.login(page)
 
         # navigate to the application page
-        page.goto(url)
-
-        with page.expect_popup() as new_page_info:
-            page.get_by_role("button", name="Easy Apply").click()
-        new_page = new_page_info.value
-        new_page.wait_for_load_state()
-        new_page.set_default_timeout(100)
-
-        # assign new page url to variable
-        # ez_url = new_page.url
-
-        # get page html
-        return new_page.content()
-
-
-    def _input_first_name(self, page, field, value):
-        page.get_by_test_id(field).fill(value)
-
-
-    def _input_last_name(self, page, field, value):
-        page.get_by_test_id(field).fill(value)
-
-
-    def _input_phone_number(self, page, field, value):
-        page.get_by_label(field, exact=True).fill(value)
-
-
-    def _input_email(self, page, field, value):
-        page.get_by_test_id(field).fill(value)
+        await page.goto(url)
 
+        async with page.expect_popup() as new_page_info:
+            await page.get_by_role("button", name="Easy Apply").click()
+        new_page = await new_page_info.value
+        new_page.set_default_timeout(step_timeout)
+        try:
+            await new_page.wait_for_load_state()
+        except Exception:
+            await new_page.close()
+            raise
 
-    def _upload_resume(self, page, field, value):
-        with page.expect_file_chooser() as file_chooser_info:
-            page.get_by_test_id(field).click()
-        file_chooser = file_chooser_info.value
-        file_chooser.set_files(value)
-        page.get_by_role("button", name="Continue").click()
+        return new_page
 
 
-    def _input_zip_code(self, page, field, value):
-        page.get_by_test_id(field).fill(value)
+    async def scrape_page(self, page, url):
+        """Scrape a job listing page for application form fields"""
 
+        new_page = await self.open_application(page, url)
 
-    def _select_country(self, page, field, value):
-        page.get_by_role("combobox", name=field).select_option(value)
+        # get page html
+        try:
+            return await new_page.content()
+        finally:
+            await new_page.close()
 
 
-    def _select_us_citizen(self, page, field, value):
-        page.locator("label").filter(has_text=r"United States Citizen|US").locator("span").first.click(timeout=5000)
+    async def submit(self, button):
+        """Click a form's submit button when SUBMIT is on, returning the application status"""
 
+        if not submit_toggle:
+            return 'filled'
+        with span('apply.submit'):
+            await button.click()
+        return 'applied'
 
-    def _select_no_answer(self, page, field, value):
-        page.get_by_text(re.compile(r"I don't wish to answer")).click()
 
+    async def fill_step(self, page, step):
+        """Fill out one Easy Apply step from its form_fields spec"""
 
-    def _select_no_recommend(self, page, field, value):
-        page.get_by_text(re.compile(r"Don't recommend me for any jobs at other employers.")).click()
+        with span(f'apply.step.{step}'):
+            report = await fill_form(page, form_fields[step])
 
+        skipped = [name for name, matched in report.items() if not matched]
+        if skipped:
+            print(f"{step}: skipped {', '.join(skipped)}")
 
-    def _click_continue(self, page, field, value):
-        page.get_by_role("button", name=field).click(timeout=5000)
+        return report
 
 
-    def _click_review(self, page, field, value):
-        page.get_by_role("button", name=field).click(timeout=5000)
+    async def current_step(self, page):
+        """Work out which Easy Apply step a page is on, from its url or else its DOM"""
 
+        for pattern, step in form_steps:
+            if pattern.search(page.url):
+                return step
 
-    def _submit_application(self, page, field, value):
-        page.get_by_role("button", name=field).click()
+        return await page.evaluate(step_probe)
 
 
-    def easy_apply(self, page, url):
-        """Apply to a job listing on Glassdoor directly from the job listing page"""
+    async def easy_apply(self, page, url):
+        """Apply to a job listing on Glassdoor directly from the job listing page
 
-        # scrape page for available fields
-        html = self.scrape_page(page, url)
-        soup = BeautifulSoup(html, 'html.parser')
-        # ic(soup.prettify())
+        Returns 'applied' once submitted, 'filled' when the review step is reached with
+        SUBMIT off, or 'incomplete' when a step doesn't lead to the next one.
+        """
 
-        # save html for debugging
-        if not Path("playwright/soup.html").is_file():
-            with open('playwright/soup.html', 'w') as f:
-                f.write(soup.prettify())
+        if self.har.mode == 'replay' and har_step:
+            # iterate on a single recorded step without going through the ones before it
+            page.set_default_timeout(step_timeout)
+            await page.goto(self.har.step_url(har_step))
+            return await self.easy_apply_steps(page)
 
+        # the form opens in a popup, which the leased page doesn't own
+        form_page = await self.open_application(page, url)
         try:
-            # TODO: check for url first
-            # * https://m5.apply.indeed.com/beta/indeedapply/form/contact-info
-            # * https://m5.apply.indeed.com/beta/indeedapply/form/resume
-            # * https://m5.apply.indeed.com/beta/indeedapply/form/questions/1
-
-            input_first_name = soup.find("input", {"id": "input-firstName"})
-            input_last_name = soup.find("input", {"id": "input-lastName"})
-            input_phone_number = soup.find("input", {"id": "input-phone"})
-            input_email = soup.find("input", {"id": "input-email"})
-            resume_upload_card = soup.find("div", {"data-testid": "resumeUploadCard"})
+            return await self.easy_apply_steps(form_page)
+        finally:
+            await form_page.close()
 
-            # TODO: QA (probably need a while loop)
-            # contact info
-            if input_first_name:
-                self._input_first_name(page, "input-firstName", first_name)
 
-            if input_last_name:
-                self._input_last_name(page, "input-lastName", last_name)
+    async def easy_apply_steps(self, form_page):
+        """Fill out the Easy Apply form page step by step, returning the application status"""
 
-            if input_phone_number:
-                self._input_phone_number(page, "input-phone", phone)
+        # run only the handler for the step we're on, then move on as soon as the next step loads
+        step = None
+        for _ in range(max_steps):
+            step = await self.current_step(form_page)
+            if step is None or step == 'review':
+                break
 
-            if input_email:
-                self._input_email(page, "input-email", email)
+            # with HAR_MODE=record, each step's html is saved next to the recording
+            await self.har.step(form_page, step)
 
-            # resume
-            if resume_upload_card:
-                self._upload_resume(page, "resumeUploadCard", resume)
+            step_url = form_page.url
+            await self.fill_step(form_page, step)
 
-            # ! pause for debugging
-            page.pause()
+            try:
+                with span('apply.wait_for_step'):
+                    await form_page.wait_for_url(lambda u: u != step_url, timeout=step_timeout)
+            except TimeoutError:
+                print(f"{step}: no next step after {step_timeout // 1000}s ({step_url})")
+                break
 
-            # questions
-            self._input_zip_code(page, "input-q_.*", zip_code)
-            self._select_country(page, "Country", country)
-            self._select_us_citizen(page, "United States Citizen", "")
-            self._select_no_answer(page, "I don't wish to answer", "")
-            self._select_no_recommend(page, "Don't recommend me for any jobs at other employers.", "")
+        if step != 'review':
+            print(f"Stopped before the review step ({form_page.url})")
+            await self._pause(form_page)
+            return 'incomplete'
 
-            # continue
-            self._click_continue(page, "Continue", "")
-        except TimeoutError:
-            pass
+        # ! pause for debugging
+        await self._pause(form_page)
 
-        # review
-        self._click_review(page, "Review your application", "")
+        return await self.submit(form_page.get_by_role("button", name="Submit your application"))
 
 
-    def greenhouse(self, page, url):
+    @timed('apply.greenhouse')
+    async def greenhouse(self, page, url):
         """
         Fill out a Greenhouse application form
 
@@ -365,48 +399,154 @@ class Driver:
         """
 
         # navigate to the application page
-        page.goto(url)
+        await page.goto(url)
+        await self.har.step(page, 'form')
 
         # basic info
-        page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("First Name *").fill(first_name)
-        page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("Last Name *").fill(last_name)
-        page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("Email *").fill(email)
-        page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("Phone *").fill(phone)
+        await page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("First Name *").fill(first_name)
+        await page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("Last Name *").fill(last_name)
+        await page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("Email *").fill(email)
+        await page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("Phone *").fill(phone)
 
         # Upload Resume
-        page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_role("group", name="Resume/CV").get_by_role("button", name="Attach,").click()
-        page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_role("group", name="Resume/CV").get_by_role("button", name="Attach,").set_input_files(resume)
+        await page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_role("group", name="Resume/CV").get_by_role("button", name="Attach,").click()
+        await page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_role("group", name="Resume/CV").get_by_role("button", name="Attach,").set_input_files(resume)
 
         # add linkedin
-        page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("LinkedIn Profile").fill(linkedin)
+        await page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_label("LinkedIn Profile").fill(linkedin)
 
         # ! pause for debugging
-        page.pause()
+        await self._pause(page)
+
+        return await self.submit(
+            page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_role("button", name="Submit Application")
+        )
+
 
-        # TODO: enable
-        # submit
-        # page.frame_locator("iframe[title=\"Greenhouse Job Board\"]").get_by_role("button", name="Submit Application").click()
+    @timed('apply.lever')
+    async def lever(self, page, url):
+        """Fill out a Lever application form
 
+        Returns 'incomplete' if the form isn't there, otherwise what submit returns.
+        """
+
+        # a posting links to its form at <posting>/apply
+        if not page.url.rstrip('/').endswith('/apply'):
+            apply_link = page.locator('a[href$="/apply"]').first
+            if await apply_link.count():
+                await apply_link.click()
+                await page.wait_for_load_state()
+        await self.har.step(page, 'form')
+
+        with span('apply.step.lever'):
+            report = await fill_form(page, lever_fields)
 
-    def lever(self, page, url):
-        """Fill out a Lever application form"""
+        skipped = [name for name, matched in report.items() if not matched]
+        if not (report['name'] and report['email']):
+            print(f"No Lever application form ({page.url})")
+            return 'incomplete'
+        if skipped:
+            print(f"lever: skipped {', '.join(skipped)}")
+
+        # ! pause for debugging
+        await self._pause(page)
 
-        pass
+        return await self.submit(page.get_by_role("button", name="Submit application"))
 
 
-def main(url, *args, **kwargs):
+async def main(urls, *args, **kwargs):
     position_title, location = job_prefs()
 
-    with sync_playwright() as playwright:
-        driver = Driver(playwright, url, *args, **kwargs)
-        driver.run()
+    # a single url or a batch of them
+    if isinstance(urls, str):
+        urls = [urls]
 
+    # launch the browser once and reuse its pages across the whole batch
+    async with async_playwright() as playwright:
+        async with ContextPool(playwright, headers=page_headers) as pool:
+            for url in urls:
+                driver = Driver(playwright, url, *args, pool=pool, **kwargs)
+                await driver.run()
 
-if __name__ == "__main__":
-    url = "https://www.glassdoor.com/job-listing/devops-engineer-avive-JV_IC1147334_KO0,15_KE16,21.htm?jl=1008587573785&pos=108&ao=1136043&s=58&guid=0000018897b30beba949200790012d9c&src=GD_JOB_AD&t=SR&vt=w&uido=EFD96E67CACCEAC9A7770DF34F9A3B58&ea=1&cs=1_4c522004&cb=1686172273881&jobListingId=1008587573785&jrtk=3-0-1h2br630km6pt801-1h2br63192ci5001-8eefae5135a7da85-&ctt=1686175543650"
 
+async def apply(playwright, pool, store, url):
+    """Apply to a single listing, checkpoint the outcome and return its status
+
+    Only 'applied' means the application was submitted; 'filled', 'incomplete'
+    and 'failed' listings stay eligible for the next batch.
+    """
+
+    action = ats(url)
     try:
-        main(url, action='easy_apply')
-    except TimeoutError as e:
-        print(e)
-        pass
+        driver = Driver(playwright, url, pool=pool, pause=False, action=action)
+        with span(f'apply.listing.{action}'):
+            status = await driver.run()
+    except Exception as e:
+        # anything a flow raises is this listing's failure, not the batch's
+        error = str(e) if isinstance(e, Error) else f"{type(e).__name__}: {e}"
+        print(f"FAILED FOR {url}: {error}")
+        store.record_application(url, action, 'failed', error)
+        return 'failed'
+
+    if status == 'applied':
+        print(f"SUCCESS FOR: {url}")
+    else:
+        print(f"{status.upper()} FOR: {url}")
+    store.record_application(url, action, status)
+    return status
+
+
+async def run_batch(export=None, workers=apply_workers, follow=False, new=False):
+    """Apply to every exported listing that hasn't been applied to yet"""
+
+    position_title, location = job_prefs()
+
+    with ExportStore() as store:
+        done = store.applied()
+
+        if follow:
+            return await follow_batch(export, workers, store, done)
+
+        if export:
+            todo = pending_urls(read_export(export), done)
+        else:
+            # everything exported by any run, or only what the latest run found
+            since = store.last_run() if new else None
+            todo = [row['url'] for row in store.not_applied(since=since) if ats(row['url'])]
+
+        await apply_all(todo, workers, store)
+
+
+async def apply_all(todo, workers, store):
+    """Apply to a list of URLs on up to `workers` pages"""
+
+    if len(todo) == 0:
+        print("No new URLs to apply to.")
+        return
+
+    workers = max(1, min(workers, len(todo)))
+    print(f"Applying to {len(todo)} URLs on {workers} page(s)...")
+
+    # flows interleave in one event loop; leasing a page from the pool caps how many run at once
+    async with async_playwright() as playwright:
+        async with ContextPool(playwright, size=workers, headers=page_headers) as pool:
+            await asyncio.gather(*(apply(playwright, pool, store, url) for url in todo))
+
+
+async def follow_batch(export, workers, store, done):
+    """Apply to listings as they're appended to a streamed export, while the scrape is still running"""
+
+    export = export or latest_export()
+    print(f"Following {export} on {workers} page(s)...")
+
+    async with async_playwright() as playwright:
+        async with ContextPool(playwright, size=workers, headers=page_headers) as pool:
+            tasks = []
+            async for record in follow_export(export):
+                for url in pending_urls([record], done):
+                    tasks.append(asyncio.create_task(apply(playwright, pool, store, url)))
+            await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_batch())
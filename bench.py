@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+
+# offline benchmarks for scrape, filter, export and apply
+# * fixtures/ is served from a local http server and the scrapers are pointed at it, so no network is needed
+# * reports throughput, latency percentiles (from the timing spans) and peak memory per scenario
+# * exits non-zero when a scenario returns the wrong results or is slower than a --baseline
+
+import os
+import tempfile
+from pathlib import Path
+
+fixtures = Path(__file__).resolve().parent / "fixtures"
+
+# settings the scripts read on import; set before they're imported, keep any overrides
+bench_env = {
+    "TIMING": "True",
+    "HEADLESS": "True",
+    "SLOW_MO": "0",
+    "PAUSE": "False",
+    "SUBMIT": "False",          # the fixture forms go nowhere either way
+    "BLOCK_REPORT": "False",
+    "FETCH_RATE": "0",          # the local server doesn't throttle
+    "POSITION_TITLE": "Python Developer",
+    "LOCATION": "Remote, US",
+    "FIRST_NAME": "Yosemite",
+    "LAST_NAME": "Sam",
+    "EMAIL": "test@test.com",
+    "PHONE": "123-456-7890",
+    "ZIP_CODE": "94103",
+    "COUNTRY": "United States",
+    "ORG": "Self-Employed",
+    "RESUME": str(fixtures / "resume.txt"),
+    "RESUME_TEXTFILE": str(fixtures / "resume.txt"),
+    "LINKEDIN": "https://www.linkedin.com/",
+    "WEBSITE": "www.youtube.com",
+    "GITHUB": "https://github.com",
+    "TWITTER": "www.twitter.com",
+    "GRAD_MONTH": "06",
+    "GRAD_YEAR": "2021",
+    "UNIVERSITY": "MIT",
+}
+for key, value in bench_env.items():
+    os.environ.setdefault(key, value)
+
+import asyncio
+import json
+import resource
+import threading
+import time
+import tracemalloc
+import typer
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from urllib.parse import parse_qs, urlparse
+
+companies = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises"]
+titles = ["Python Developer", "Backend Engineer", "Platform Engineer", "Data Engineer", "Site Reliability Engineer"]
+
+browser_scenarios = ["aggregate_links", "api_listings", "filter_urls", "export_urls", "apply"]
+
+# names of the fields left empty in the form around a submit button
+empty_fields_script = """
+button => {
+    const form = button.closest('form');
+    if (!form) return [];
+    return [...form.elements]
+        .filter(el => el.matches('input, select, textarea'))
+        .filter(el => !(el.type === 'file' ? el.files.length : el.value))
+        .map(el => el.name || el.id);
+}
+"""
+
+
+def template(name):
+    return Template((fixtures / name).read_text())
+
+
+class Fixtures:
+    """Deterministic listing data rendered into the fixture templates"""
+
+    def __init__(self, pages, per_page):
+        self.pages = pages
+        self.per_page = per_page
+        self.templates = {
+            name: template(name)
+            for name in ["results.html", "card.html", "listing.html", "apply.html",
+                         "greenhouse.html", "greenhouse_board.html", "lever.html"]
+        }
+
+
+    def listing(self, job_id):
+        """Title, company and filter outcome for a listing id"""
+
+        n = int(job_id)
+        return {
+            "id": job_id,
+            "title": titles[n % len(titles)],
+            "company": companies[n % len(companies)],
+            # every 4th listing mentions a stop word, every 5th isn't Easy Apply
+            "stack": "Java and Spring" if n % 4 == 0 else "Celery and RabbitMQ",
+            "apply": "Apply on company site" if n % 5 == 0 else "Easy Apply",
+        }
+
+
+    def results(self, page):
+        first = (page - 1) * self.per_page
+        cards = "\n".join(
+            self.templates["card.html"].substitute(pos=i + 1, **self.listing(str(1000 + first + i)))
+            for i in range(self.per_page)
+        )
+        nxt = f'        <li class="next"><a href="/results/{page + 1}">Next</a></li>' if page < self.pages else ''
+        return self.templates["results.html"].substitute(page=page, cards=cards, next=nxt)
+
+
+    def search_results(self, page):
+        """A page of results as the search api's graphql response"""
+
+        first = (page - 1) * self.per_page
+        listings = []
+        for i in range(self.per_page):
+            listing = self.listing(str(1000 + first + i))
+            listings.append({"jobview": {
+                "header": {
+                    "jobLink": f"/partner/jobListing.htm?pos={i + 1}&ao=1136043&jobListingId={listing['id']}",
+                    "employerNameFromSearch": listing["company"],
+                    "easyApply": listing["apply"] == "Easy Apply",
+                    "payCurrency": "USD",
+                    "payPeriod": "ANNUAL",
+                    "payPeriodAdjustedPay": {"p10": 100000, "p50": 140000, "p90": 180000},
+                },
+                "job": {"listingId": int(listing["id"]), "jobTitleText": listing["title"]},
+            }})
+        cursors = [{"cursor": f"cursor-{n}", "pageNumber": n} for n in range(1, self.pages + 1)]
+        return [{"data": {"jobListings": {"jobListings": listings, "paginationCursors": cursors}}}]
+
+
+    def render(self, name, job_id):
+        return self.templates[name].substitute(**self.listing(job_id))
+
+
+    def expected(self):
+        """Listing ids that should survive filter_urls with the default stop words"""
+
+        ids = (str(1000 + i) for i in range(self.pages * self.per_page))
+        return {i for i in ids if int(i) % 4 and int(i) % 5}
+
+
+def make_handler(data, latency):
+    """Request handler serving `data`, sleeping `latency` seconds per request like a remote host"""
+
+    step_pages = {
+        "contact-info": "indeed/contact-info.html",
+        "resume": "indeed/resume.html",
+        "questions": "indeed/questions.html",
+        "review": "indeed/review.html",
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body go out in separate writes; don't let delayed ACKs stall keep-alive
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+
+        def send(self, status, body=b'', headers=None):
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            if body:
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+
+        def do_HEAD(self):
+            self.do_GET()
+
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            query = parse_qs(url.query)
+
+            if parts[0] == "results":
+                return self.send(200, data.results(int(parts[1])).encode())
+            if url.path == "/partner/jobListing.htm":
+                return self.send(200, data.render("listing.html", query["jobListingId"][0]).encode())
+
+            # glassdoor -> tracking hop -> ATS, like a partner link
+            if parts[0] == "redirect" and len(parts) == 2:
+                return self.send(302, headers={"Location": f"/redirect/{parts[1]}/hop"})
+            if parts[0] == "redirect":
+                ats = "greenhouse" if int(parts[1]) % 2 else "lever"
+                return self.send(302, headers={"Location": f"/{ats}/{parts[1]}"})
+
+            if parts[0] in ("apply", "greenhouse", "lever") and len(parts) == 2:
+                return self.send(200, data.render(f"{parts[0]}.html", parts[1]).encode())
+            if parts[0] == "greenhouse-board":
+                return self.send(200, data.render("greenhouse_board.html", parts[1]).encode())
+            if parts[:3] == ["beta", "indeedapply", "form"] and parts[3] in step_pages:
+                return self.send(200, (fixtures / step_pages[parts[3]]).read_bytes())
+
+            if url.path == "/search":
+                return self.send(200, (fixtures / "search.html").read_bytes())
+
+            self.send(404)
+
+
+        def do_POST(self):
+            if latency:
+                time.sleep(latency)
+
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if urlparse(self.path).path != "/graph":
+                return self.send(404)
+            page = body[0]["variables"].get("pageNumber") or 1
+            return self.send(200, json.dumps(data.search_results(page)).encode())
+
+    return Handler
+
+
+def serve(data, latency):
+    """Start the fixture server on a free port and return it"""
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(data, latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Result:
+    """Wall time, item count and memory growth for one scenario
+
+    Memory is how much the process high-water mark grew, or with `trace` the peak of
+    python allocations (tracemalloc slows allocation-heavy code down ~3x, so it's opt-in).
+    """
+
+    trace = False
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.ok = True
+        self.note = ''
+
+
+    def __enter__(self):
+        import timing
+
+        timing.samples.clear()
+        if self.trace:
+            tracemalloc.start()
+        self.rss_kb = max_rss_kb()
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc):
+        import timing
+
+        self.seconds = time.perf_counter() - self.start
+        if self.trace:
+            self.peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        else:
+            self.peak_kb = max_rss_kb() - self.rss_kb
+        self.spans = timing.summary()
+        timing.samples.clear()
+
+
+    def as_dict(self):
+        return {
+            "items": self.items,
+            "seconds": round(self.seconds, 3),
+            "items_per_s": round(self.items / self.seconds, 2) if self.seconds else 0,
+            "peak_kb": round(self.peak_kb, 1),
+            "ok": self.ok,
+            "note": self.note,
+            "spans": self.spans,
+        }
+
+
+def bench_extract(data, rounds=20):
+    """Parse the results and listing fixtures without a browser"""
+
+    from extract import job_links, page_text
+    from timing import span
+
+    results = [data.results(page) for page in range(1, data.pages + 1)]
+    listings = [data.render("listing.html", str(1000 + i)) for i in range(data.per_page)]
+
+    with Result("extract") as result:
+        for _ in range(rounds):
+            for html in results:
+                with span("extract.job_links"):
+                    result.items += len(job_links(html, cls="job_link"))
+            for html in listings:
+                with span("extract.page_text"):
+                    page_text(html, "Easy Apply")
+                result.items += 1
+    return result
+
+
+def bench_resolve(data, base):
+    """Follow two-hop redirect chains concurrently through the shared limiter"""
+
+    from resolver import resolve_urls
+
+    links = [f"{base}/redirect/{1000 + i}" for i in range(data.pages * data.per_page)]
+
+    with Result("resolve") as result:
+        for link, final in resolve_urls(links):
+            if final and ("/greenhouse/" in final or "/lever/" in final):
+                result.items += 1
+    result.ok = result.items == len(links)
+    result.note = f"{result.items}/{len(links)} resolved"
+    return result
+
+
+async def bench_browser(data, base, scenarios):
+    """Run the playwright scrape, filter, export and apply flows against the fixture server"""
+
+    import apply_pw
+    import get_links_pw
+    from blocker import RequestBlocker
+    from browser_pool import ContextPool
+    from playwright.async_api import async_playwright
+
+    await get_links_pw.job_prefs()
+    search_mode = get_links_pw.search_mode
+    apply_pw.job_prefs()
+
+    class ScrapeDriver(get_links_pw.Driver):
+        # the search form is replaced by the first fixture results page
+        async def go_to_listings(self, page):
+            await page.goto(f"{base}/results/1")
+
+
+    class SearchApiDriver(get_links_pw.Driver):
+        # a page that loads its results from the fixture graphql endpoint
+        async def go_to_listings(self, page):
+            await self.load_results(page, f"{base}/search")
+
+
+    class ApplyDriver(apply_pw.Driver):
+        empty = None
+
+        # fixtures don't need a glassdoor session
+        async def login(self, page):
+            return True
+
+
+        # check what the flow filled in before the form is submitted (or left, with SUBMIT off)
+        async def submit(self, button):
+            self.empty = await button.evaluate(empty_fields_script)
+            return await super().submit(button)
+
+    results = []
+    async with async_playwright() as playwright:
+        async with ContextPool(playwright, size=1, headers=get_links_pw.headers, blocker=RequestBlocker()) as pool:
+            async with pool.page() as page:
+                if "aggregate_links" in scenarios:
+                    driver = ScrapeDriver(playwright, base, pool=pool)
+                    with Result("aggregate_links") as result:
+                        links = await driver.aggregate_links(page)
+                        result.items = len(links)
+                    result.ok = result.items == data.pages * data.per_page
+                    result.note = f"{result.items} links"
+                    driver.cache.close()
+                    results.append(result)
+
+                if "api_listings" in scenarios:
+                    driver = SearchApiDriver(playwright, base, pool=pool)
+                    get_links_pw.search_mode = "api"
+                    try:
+                        with Result("api_listings") as result:
+                            listings = await driver.get_listings(page)
+                            result.items = len(listings)
+                    finally:
+                        get_links_pw.search_mode = search_mode
+                    result.ok = result.items == data.pages * data.per_page
+                    result.note = f"{result.items} listings, {sum(bool(listing.get('easy_apply')) for listing in listings)} easy apply"
+                    driver.cache.close()
+                    results.append(result)
+
+                if "filter_urls" in scenarios:
+                    driver = ScrapeDriver(playwright, base, pool=pool)
+                    with Result("filter_urls") as result:
+                        urls = await driver.filter_urls(page, keyword="Easy Apply")
+                        result.items = data.pages * data.per_page
+                    kept = {parse_qs(urlparse(u).query)["jobListingId"][0] for u in urls}
+                    result.ok = kept == data.expected()
+                    result.note = f"{len(kept)} kept"
+                    driver.cache.close()
+                    results.append(result)
+
+                if "export_urls" in scenarios:
+                    driver = ScrapeDriver(playwright, base, pool=pool)
+                    with Result("export_urls") as result:
+                        await driver.export_urls(page)
+                        export = max(Path("exports").glob("urls_*.jsonl"))
+                        result.items = sum(1 for line in export.open() if '"url"' in line)
+                    result.ok = result.items == data.pages * data.per_page
+                    result.note = f"{result.items} records"
+                    driver.cache.close()
+                    results.append(result)
+
+            if "apply" in scenarios:
+                # a flow that reaches its submit button returns 'filled' with SUBMIT off
+                done = 'applied' if apply_pw.submit_toggle else 'filled'
+                flows = [("easy_apply", "apply"), ("greenhouse", "greenhouse"), ("lever", "lever")]
+                for action, path in flows:
+                    statuses, empty = Counter(), set()
+                    with Result(f"apply.{action}") as result:
+                        for i in range(data.per_page // 3 or 1):
+                            driver = ApplyDriver(playwright, f"{base}/{path}/{1000 + i}", pool=pool, pause=False, action=action)
+                            statuses[await driver.run()] += 1
+                            empty.update(driver.empty or [])
+                            result.items += 1
+                    result.ok = set(statuses) == {done} and not empty
+                    result.note = ', '.join(f"{status}: {n}" for status, n in statuses.items())
+                    if empty:
+                        result.note += f"; left empty: {', '.join(sorted(empty))}"
+                    results.append(result)
+
+    return results
+
+
+def report(results):
+    print(f"\n{'scenario':<22}{'items':>7}{'items/s':>10}{'seconds':>9}{'mem KB':>10}  ok  note")
+    for result in results:
+        row = result.as_dict()
+        print(
+            f"{result.name:<22}{row['items']:>7}{row['items_per_s']:>10.1f}{row['seconds']:>9.2f}"
+            f"{row['peak_kb']:>10.0f}  {'y' if row['ok'] else 'n':<2}  {row['note']}"
+        )
+        for span_name, stats in row["spans"].items():
+            print(f"  {span_name:<32} n={stats['count']:<5} p50={stats['p50_ms']:.1f}ms "
+                  f"p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms")
+
+
+def compare(results, baseline, tolerance):
+    """Return the scenarios whose throughput dropped more than `tolerance` below the baseline"""
+
+    previous = json.loads(Path(baseline).read_text())["scenarios"]
+    slower = []
+    for name, row in results.items():
+        before = previous.get(name, {}).get("items_per_s")
+        if before and row["items_per_s"] < before * (1 - tolerance):
+            slower.append(f"{name}: {row['items_per_s']} items/s (baseline {before})")
+    return slower
+
+
+def main(
+    pages: int = typer.Option(4, help="Results pages to serve"),
+    per_page: int = typer.Option(30, help="Listings per results page"),
+    latency: float = typer.Option(20, help="Milliseconds the server waits before each response"),
+    browser: bool = typer.Option(True, help="Run the playwright scenarios (needs chromium installed)"),
+    output: Path = typer.Option(None, help="Write the results as JSON"),
+    baseline: Path = typer.Option(None, help="Fail if throughput drops below a previous --output"),
+    tolerance: float = typer.Option(0.25, help="Allowed throughput drop against the baseline"),
+    trace_memory: bool = typer.Option(False, help="Report peak python allocations (slower) instead of RSS growth"),
+):
+    """Benchmark scrape, filter, export and apply offline against the fixture server"""
+
+    # resolve before leaving the repo for the scratch directory
+    output = output and output.resolve()
+    baseline = baseline and baseline.resolve()
+
+    Result.trace = trace_memory
+    data = Fixtures(pages, per_page)
+    server = serve(data, latency / 1000)
+    base = f"http://127.0.0.1:{server.server_port}"
+    # never let a configured GLASSDOOR_URL send the benchmark to the real site
+    os.environ["GLASSDOOR_URL"] = base
+
+    # listing cache, export store, exports and browser state all live in a scratch directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        Path("playwright/.auth").mkdir(parents=True)
+        try:
+            results = [bench_extract(data), bench_resolve(data, base)]
+            if browser:
+                results += asyncio.run(bench_browser(data, base, browser_scenarios))
+        finally:
+            os.chdir(cwd)
+
+    server.shutdown()
+    report(results)
+
+    summary = {
+        "pages": pages,
+        "per_page": per_page,
+        "latency_ms": latency,
+        "memory": "tracemalloc peak" if trace_memory else "max rss growth",
+        "max_rss_kb": max_rss_kb(),
+        "scenarios": {result.name: result.as_dict() for result in results},
+    }
+    print(f"\nmax rss: {summary['max_rss_kb'] / 1024:.0f} MB (python only; chromium runs in its own processes)")
+
+    if output:
+        output.write_text(json.dumps(summary, indent=2))
+        print(f"Results written to {output}")
+
+    failed = [result.name for result in results if not result.ok]
+    if failed:
+        print(f"Wrong results: {', '.join(failed)}")
+    slower = compare(summary["scenarios"], baseline, tolerance) if baseline else []
+    for line in slower:
+        print(f"Regression: {line}")
+    if failed or slower:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import inspect
+from collections import Counter, defaultdict
+from decouple import config, Csv
+from urllib.parse import urlparse
+
+# env vars
+blocked_types = config('BLOCK_RESOURCE_TYPES', default='image,media,font', cast=Csv())
+blocked_hosts = config(
+    'BLOCK_HOSTS',
+    default='doubleclick.net,google-analytics.com,googletagmanager.com,googlesyndication.com,'
+            'facebook.net,hotjar.com,optimizely.com,scorecardresearch.com,adnxs.com,amazon-adsystem.com',
+    cast=Csv()
+)
+report_toggle = config('BLOCK_REPORT', default=True, cast=bool)
+
+# blocked requests are never downloaded, so what they saved is a guess: rough median
+# transfer sizes by resource type, and small beacons/scripts for blocked hosts
+typical_bytes = {
+    'image': 30_000,
+    'media': 500_000,
+    'font': 40_000,
+    'script': 25_000,
+    'stylesheet': 15_000,
+}
+other_bytes = 2_000
+
+
+class RequestBlocker:
+    """Abort requests for resource types and hosts that aren't needed for link extraction
+
+    Counts are kept per page and printed each time a page finishes loading. Loaded bytes
+    are the response body sizes reported by the browser; blocked bytes are estimated
+    from `typical_bytes`.
+    """
+
+    def __init__(self, types=blocked_types, hosts=blocked_hosts, report=report_toggle):
+        self.types = set(types)
+        self.hosts = tuple(host.lstrip('.') for host in hosts)
+        self.report = report
+        self.stats = defaultdict(Counter)
+
+
+    def blocks(self, request):
+        """Return True if the request isn't needed"""
+
+        if request.resource_type in self.types:
+            return True
+        host = urlparse(request.url).hostname or ''
+        return any(host == h or host.endswith('.' + h) for h in self.hosts)
+
+
+    def install(self, context):
+        """Route every request in the context through the blocker (await the result with the async api)"""
+
+        context.on("page", self.watch)
+        context.on("requestfinished", self._on_finished)
+        return context.route("**/*", self._on_route)
+
+
+    def watch(self, page):
+        page.on("load", lambda: self._on_load(page))
+        page.on("close", lambda: self.stats.pop(page, None))
+
+
+    def _page(self, request):
+        # service worker requests don't belong to a page
+        try:
+            return request.frame.page
+        except Exception:
+            return None
+
+
+    def _on_route(self, route):
+        # returns the coroutine to await with the async api, None with the sync api
+        request = route.request
+        if self.blocks(request):
+            stats = self.stats[self._page(request)]
+            stats['blocked'] += 1
+            stats[f'blocked_{request.resource_type}'] += 1
+            stats['saved_bytes'] += typical_bytes.get(request.resource_type, other_bytes)
+            return route.abort()
+        return route.continue_()
+
+
+    def _on_finished(self, request):
+        # sizes() is a coroutine with the async api, so hand that back to the event loop to run
+        try:
+            sizes = request.sizes()
+        except Exception:
+            sizes = {}
+        if inspect.isawaitable(sizes):
+            return self._count_async(request, sizes)
+        self._count(request, sizes)
+
+
+    async def _count_async(self, request, sizes):
+        try:
+            sizes = await sizes
+        except Exception:
+            # the page or context closed before the sizes could be read
+            sizes = {}
+        self._count(request, sizes)
+
+
+    def _count(self, request, sizes):
+        stats = self.stats[self._page(request)]
+        stats['loaded'] += 1
+        stats['bytes'] += max(sizes.get('responseBodySize', 0), 0)
+
+
+    def _on_load(self, page):
+        stats = self.stats.pop(page, Counter())
+        if not self.report:
+            return
+        by_type = ', '.join(
+            f"{key.removeprefix('blocked_')}: {n}" for key, n in sorted(stats.items()) if key.startswith('blocked_')
+        )
+        print(
+            f"Blocked {stats['blocked']} requests / ~{stats['saved_bytes'] / 1024:.0f} KB ({by_type or 'none'}), "
+            f"loaded {stats['loaded']} requests / {stats['bytes'] / 1024:.0f} KB: {page.url}"
+        )
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+import asyncio
+from contextlib import asynccontextmanager
+from decouple import config
+from pathlib import Path
+from timing import meta, span
+
+# env vars
+headless_toggle = config('HEADLESS', default=False, cast=bool)  # default is False
+pool_size = config('POOL_SIZE', default=1, cast=int)
+page_max_uses = config('PAGE_MAX_USES', default=20, cast=int)
+slow_mo = config('SLOW_MO', default=100, cast=int)      # ms between actions
+debugging_port = config('REMOTE_DEBUGGING_PORT', default=0, cast=int)   # 0: off; only one browser at a time can have it
+
+state = Path("playwright/.auth/state.json")
+viewport = {"width": 1280, "height": 1400}
+
+launch_options = {
+    "args": [
+        '--disable-blink-features=AutomationControlled',
+        '--disable-gpu',
+        '--disable-dev-shm-usage',
+        '--disable-setuid-sandbox',
+        '--no-first-run',
+        '--no-sandbox',
+        '--no-zygote',
+        '--ignore-certificate-errors',
+        '--disable-extensions',
+        '--disable-infobars',
+        '--disable-notifications',
+        '--disable-popup-blocking',
+        *([f'--remote-debugging-port={debugging_port}'] if debugging_port else []),
+    ],
+    "headless": headless_toggle,
+    "slow_mo": slow_mo,
+    "devtools": False,
+}
+
+
+def context_options(headers=None):
+    """Options for a new context, reusing the saved session if there is one"""
+
+    options = {"viewport": viewport}
+    if state.is_file():
+        options["storage_state"] = str(state)
+    if headers:
+        options["extra_http_headers"] = headers
+    return options
+
+
+class ContextPool:
+    """Launch the browser once and lease pages from `size` contexts sharing the saved session
+
+    Pages are closed and replaced after `max_uses` leases to keep browser memory in check.
+    An optional RequestBlocker is installed on every context.
+    """
+
+    def __init__(self, playwright, size=pool_size, max_uses=page_max_uses, headers=None, blocker=None):
+        self.playwright = playwright
+        self.size = size
+        self.max_uses = max_uses
+        self.headers = headers
+        self.blocker = blocker
+        self.browser = None
+        self.contexts = []
+        self._idle = asyncio.Queue()
+
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+    async def start(self):
+        # slow_mo is added to every browser action, so keep it next to the timings
+        meta.update(slow_mo_ms=slow_mo, headless=headless_toggle, pool_size=self.size)
+        with span('browser.launch'):
+            self.browser = await self.playwright.chromium.launch(**launch_options)
+        for _ in range(self.size):
+            context = await self.browser.new_context(**context_options(self.headers))
+            if self.blocker:
+                await self.blocker.install(context)
+            self.contexts.append(context)
+            await self._idle.put((context, await context.new_page(), 0))
+
+
+    @asynccontextmanager
+    async def page(self):
+        """Lease a page for the duration of the block"""
+
+        context, page, uses = await self._idle.get()
+        try:
+            yield page
+        finally:
+            uses += 1
+            if uses >= self.max_uses or page.is_closed():
+                if not page.is_closed():
+                    await page.close()
+                page, uses = await context.new_page(), 0
+            self._idle.put_nowait((context, page, uses))
+
+
+    @asynccontextmanager
+    async def session(self, har):
+        """Lease a page in a fresh context that records to or replays from a HarSession
+
+        A pool lease is held meanwhile, so sessions count against the pool size.
+        """
+
+        async with self.page():
+            context = await self.browser.new_context(**context_options(self.headers), **har.context_options())
+            if self.blocker:
+                await self.blocker.install(context)
+            try:
+                # installed last so it's consulted before the blocker
+                await har.install(context)
+                yield await context.new_page()
+            finally:
+                # closing the context writes the HAR
+                await context.close()
+                har.save()
+
+
+    async def save_state(self):
+        """Save cookies, local storage, etc. for the next run"""
+
+        await self.contexts[0].storage_state(path=str(state))
+
+
+    async def close(self):
+        for context in self.contexts:
+            await context.close()
+        if self.browser:
+            await self.browser.close()
+
+
+@asynccontextmanager
+async def lease_page(playwright, pool=None, har=None, save_state=True, **options):
+    """Lease a page for one run of a flow, from `pool` or else a browser launched just for it
+
+    The page records to or replays from `har` when that's active. The session state is
+    saved when the block completes, unless it came from a recording or `save_state` is off.
+    `options` are ContextPool options for the one-off browser.
+    """
+
+    own = pool is None
+    if own:
+        pool = ContextPool(playwright, size=1, **options)
+        await pool.start()
+
+    try:
+        async with (pool.session(har) if har else pool.page()) as page:
+            yield page
+
+            if save_state and (har is None or har.mode != 'replay'):
+                await pool.save_state()
+    finally:
+        if own:
+            await pool.close()
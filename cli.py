@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import typer
+from pathlib import Path
+from typing import List
+
+# each command imports the modules it needs when it runs, so `--help` stays fast
+app = typer.Typer(
+    help="Search Glassdoor for job listings, export them, and apply.",
+    add_completion=False,
+    no_args_is_help=True,
+    rich_markup_mode=None,
+)
+
+
+def scrape_listings(action):
+    """Run a get_links_pw action in a fresh browser and return its result"""
+
+    import asyncio
+    import get_links_pw
+
+    return asyncio.run(get_links_pw.main(get_links_pw.url, action=action))
+
+
+@app.command()
+def scrape():
+    """Print every listing URL in the search results"""
+
+    for url in sorted(scrape_listings('get_urls') or []):
+        print(url)
+
+
+@app.command(name="filter")
+def filter_():
+    """Print the Easy Apply listings that pass the STOP_WORDS/INCLUDE_WORDS filters"""
+
+    for url in sorted(scrape_listings('filter_urls') or []):
+        print(url)
+
+
+@app.command()
+def export():
+    """Stream the search results to exports/urls_<timestamp>.jsonl and the export store"""
+
+    scrape_listings('export_urls')
+
+
+@app.command()
+def apply(
+    export: Path = typer.Option(None, help="Apply to a single export file instead of the store"),
+    workers: int = typer.Option(None, help="Application flows run side by side (default: APPLY_WORKERS)"),
+    follow: bool = typer.Option(False, help="Keep applying as a running scrape appends to the export"),
+    new: bool = typer.Option(False, help="Only apply to listings first found by the latest run"),
+):
+    """Apply to every exported listing that hasn't been applied to yet"""
+
+    import apply_pw
+    import asyncio
+
+    asyncio.run(apply_pw.run_batch(export, workers or apply_pw.apply_workers, follow, new))
+
+
+@app.command()
+def shard(
+    title: List[str] = typer.Option(None, help="Position title to search for, repeatable (default: SHARD_TITLES)"),
+    location: List[str] = typer.Option(None, help="Location to search in, repeatable (default: SHARD_LOCATIONS)"),
+    workers: int = typer.Option(None, help="Processes, each with its own browser (default: SHARD_WORKERS)"),
+):
+    """Scrape every title x location search in parallel into one deduplicated export"""
+
+    import shard
+
+    queries = shard.query_matrix(title or shard.shard_titles, location or shard.shard_locations)
+    shard.scrape_all(queries, workers or shard.shard_workers)
+
+
+@app.command()
+def publish(
+    export: Path = typer.Option(None, help="Queue a single export file instead of the store"),
+    new: bool = typer.Option(False, help="Only queue listings first found by the latest run"),
+):
+    """Queue the exported listings that haven't been applied to yet for `work`"""
+
+    import work_queue
+
+    work_queue.publish_export(export, new)
+
+
+@app.command()
+def work(
+    workers: int = typer.Option(None, help="Worker processes on this host, each with its own browser (default: QUEUE_WORKERS)"),
+    forever: bool = typer.Option(False, help="Keep polling for new jobs instead of exiting once the queue is drained"),
+):
+    """Claim queued listings and apply to them; run it on every host sharing the queue"""
+
+    import work_queue
+
+    work_queue.start_workers(workers or work_queue.queue_workers, forever)
+
+
+@app.command()
+def status(retry: bool = typer.Option(False, help="Requeue dead jobs with a fresh set of attempts")):
+    """Print the work queue's job counts by status and its current leases"""
+
+    import work_queue
+
+    work_queue.print_status(retry)
+
+
+@app.command(name="open")
+def open_(export: Path = typer.Option(None, help="Open an export file instead of what's new")):
+    """Open the listings new since the last run in the browser"""
+
+    import open_in_browser
+
+    open_in_browser.main(export)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import sqlite3
+import time
+from decouple import config
+from listing_cache import listing_key
+from pathlib import Path
+from urllib.parse import urlparse
+
+# env vars
+store_path = config('EXPORT_STORE', default='exports/listings.sqlite')
+
+schema = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at  REAL NOT NULL,
+    finished_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS exports (
+    key         TEXT PRIMARY KEY,
+    url         TEXT NOT NULL,
+    listing_id  TEXT,
+    ats         TEXT,
+    host        TEXT,
+    title       TEXT,
+    company     TEXT,
+    first_seen  REAL NOT NULL,
+    last_seen   REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS exports_listing_id ON exports (listing_id);
+CREATE INDEX IF NOT EXISTS exports_host ON exports (host);
+CREATE INDEX IF NOT EXISTS exports_first_seen ON exports (first_seen);
+
+CREATE TABLE IF NOT EXISTS applications (
+    key     TEXT PRIMARY KEY,
+    url     TEXT NOT NULL,
+    action  TEXT,
+    status  TEXT NOT NULL,
+    error   TEXT,
+    time    REAL NOT NULL
+);
+"""
+
+
+class ExportStore:
+    """Every listing ever exported, deduplicated across runs, plus what's been applied to
+
+    Export runs write into it and apply reads from it, so "what's new" and "what's left"
+    are index lookups instead of a scan over every exports/urls_* file. Listings are keyed
+    on their listing ID (see listing_cache.listing_key), and keep the URL they were last seen at.
+    """
+
+    def __init__(self, path=store_path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        # let apply read while a scrape is still writing
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(schema)
+        self.run_id = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+    def start_run(self):
+        """Start an export run; listings first seen from now on count as new"""
+
+        cursor = self.conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),))
+        self.conn.commit()
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+
+    def finish_run(self):
+        self.conn.execute(
+            "UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), self.run_id)
+        )
+        self.conn.commit()
+
+
+    def add(self, record):
+        """Store an export record, returning True if the listing hasn't been exported before"""
+
+        now = time.time()
+        key = listing_key(record['url'], record.get('listing_id'))
+        cursor = self.conn.execute(
+            """
+            INSERT OR IGNORE INTO exports (key, url, listing_id, ats, host, title, company, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                key,
+                record['url'],
+                record.get('listing_id'),
+                record.get('ats'),
+                urlparse(record['url']).hostname,
+                record.get('title'),
+                record.get('company'),
+                now,
+                now,
+            ),
+        )
+        new = cursor.rowcount == 1
+        if not new:
+            self.conn.execute("UPDATE exports SET url = ?, last_seen = ? WHERE key = ?", (record['url'], now, key))
+        self.conn.commit()
+        return new
+
+
+    def last_run(self):
+        """Return when the latest export run started, or None if there hasn't been one"""
+
+        row = self.conn.execute("SELECT started_at FROM runs ORDER BY run_id DESC LIMIT 1").fetchone()
+        return row['started_at'] if row else None
+
+
+    def new_since_last_run(self):
+        """Return the listings first seen during the latest export run"""
+
+        started_at = self.last_run()
+        if started_at is None:
+            return []
+        return self.conn.execute(
+            "SELECT * FROM exports WHERE first_seen >= ? ORDER BY first_seen", (started_at,)
+        ).fetchall()
+
+
+    def not_applied(self, ats=None, since=None):
+        """Return exported listings without a successful application, oldest first"""
+
+        query = """
+            SELECT exports.* FROM exports
+            LEFT JOIN applications ON applications.key = exports.key AND applications.status = 'applied'
+            WHERE applications.key IS NULL
+        """
+        params = []
+        if ats:
+            query += " AND exports.ats = ?"
+            params.append(ats)
+        if since:
+            query += " AND exports.first_seen >= ?"
+            params.append(since)
+        return self.conn.execute(query + " ORDER BY exports.first_seen", params).fetchall()
+
+
+    def applied(self):
+        """Return the keys of the listings applied to in previous batches"""
+
+        rows = self.conn.execute("SELECT key FROM applications WHERE status = 'applied'")
+        return {row['key'] for row in rows}
+
+
+    def record_application(self, url, action, status, error=None):
+        """Store the outcome of an application (a later success overwrites a failure)"""
+
+        self.conn.execute(
+            """
+            INSERT INTO applications (key, url, action, status, error, time) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                url = excluded.url,
+                action = excluded.action,
+                status = excluded.status,
+                error = excluded.error,
+                time = excluded.time
+            WHERE applications.status != 'applied'
+            """,
+            (listing_key(url), url, action, status, error, time.time()),
+        )
+        self.conn.commit()
+
+
+    def application(self, url):
+        """Return the latest recorded application for a URL, or None"""
+
+        return self.conn.execute("SELECT * FROM applications WHERE key = ?", (listing_key(url),)).fetchone()
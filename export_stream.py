@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os
+import time
+from contextlib import suppress
+from decouple import config
+from listing_cache import listing_key
+from pathlib import Path
+from urllib.parse import urlparse
+
+# env vars
+fsync_every = config('EXPORT_FSYNC_EVERY', default=20, cast=int)        # records between fsyncs
+fsync_interval = config('EXPORT_FSYNC_INTERVAL', default=5, cast=float)  # or seconds, whichever is first
+idle_timeout = config('EXPORT_IDLE_TIMEOUT', default=300, cast=float)   # stop tailing an export nobody writes to
+
+exports = Path("exports")
+
+# apply flow for each ats, by the domain its listings are hosted on (or a subdomain of it)
+ats_domains = {
+    'greenhouse.io': 'greenhouse',
+    'lever.co': 'lever',
+    'glassdoor.com': 'easy_apply',
+}
+
+
+def ats(url):
+    """Return the apply flow for a job listing URL"""
+
+    host = urlparse(url).hostname or ''
+    for domain, flow in ats_domains.items():
+        if host == domain or host.endswith('.' + domain):
+            return flow
+    return None
+
+
+def latest_export():
+    """Return the newest exports/urls_* file, streamed (.jsonl) or not (.json)"""
+
+    return max(
+        [*exports.glob('urls_*.json'), *exports.glob('urls_*.jsonl')],
+        key=lambda path: path.stem
+    )
+
+
+def parse_line(line):
+    """Return the record on an NDJSON line, or None for a partial line or the end marker"""
+
+    with suppress(json.JSONDecodeError):
+        record = json.loads(line)
+        if 'url' in record:
+            return record
+    return None
+
+
+def read_export(export=None):
+    """Yield the records in an export, defaulting to the latest one
+
+    Old .json exports are a plain list of URLs, so they're wrapped as {"url": ...} records.
+    """
+
+    export = Path(export or latest_export())
+
+    if export.suffix == '.json':
+        with open(export) as f:
+            for url in json.load(f):
+                yield {"url": url}
+        return
+
+    with open(export) as f:
+        for line in f:
+            record = parse_line(line)
+            if record:
+                yield record
+
+
+async def follow_export(export=None, poll=1.0, idle=idle_timeout):
+    """Yield records as they're appended to a streamed export, like `tail -f`
+
+    Stops at the writer's end marker, or once nothing has been appended for `idle` seconds.
+    """
+
+    export = Path(export or latest_export())
+    if export.suffix == '.json':
+        for record in read_export(export):
+            yield record
+        return
+
+    buffer = ''
+    last_write = time.monotonic()
+    with open(export) as f:
+        while True:
+            line = f.readline()
+            if not line:
+                if time.monotonic() - last_write > idle:
+                    return
+                await asyncio.sleep(poll)
+                continue
+
+            last_write = time.monotonic()
+
+            # the writer may be mid-line; wait for the rest of it
+            buffer += line
+            if not buffer.endswith('\n'):
+                continue
+            line, buffer = buffer, ''
+
+            record = parse_line(line)
+            if record:
+                yield record
+            elif '"end"' in line:
+                return
+
+
+class ExportWriter:
+    """Append one JSON record per listing to an NDJSON export while the scrape runs
+
+    Listings already written are dropped (by listing ID, so the same listing found by
+    another search with a different URL is too), and the file is fsynced every `every` records or
+    `interval` seconds so a crash loses at most the last few listings.
+    """
+
+    def __init__(self, path, every=fsync_every, interval=fsync_interval):
+        self.path = Path(path)
+        self.every = every
+        self.interval = interval
+        self.count = 0
+        self.keys = set()
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'a')
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def write(self, record):
+        """Append a record, returning False if its listing was already exported"""
+
+        key = listing_key(record['url'], record.get('listing_id'))
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+
+        record.setdefault('time', time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()))
+        self.file.write(json.dumps(record) + '\n')
+        self.count += 1
+        self._unsynced += 1
+
+        if self._unsynced >= self.every or time.monotonic() - self._synced_at >= self.interval:
+            self.sync()
+        return True
+
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+
+    def close(self):
+        if self.file.closed:
+            return
+        # tell anyone tailing the file that the scrape is done
+        self.file.write(json.dumps({"end": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())}) + '\n')
+        self.sync()
+        self.file.close()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# use the fastest parser that's installed
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+try:
+    import lxml  # noqa: F401
+    parser = 'lxml'
+except ImportError:
+    parser = 'html.parser'
+
+
+def make_soup(html, only=None):
+    """Parse html with the fastest available parser, optionally keeping only tags matching a SoupStrainer"""
+
+    return BeautifulSoup(html, parser, parse_only=only)
+
+
+def job_links(html, cls='job_link'):
+    """Return the hrefs of every <a class="..."> job link on a results page"""
+
+    if HTMLParser:
+        return [node.attributes['href'] for node in HTMLParser(html).css(f'a.{cls}[href]')]
+
+    # the strainer sees the raw class attribute, so match it as a space-separated list
+    soup = make_soup(html, SoupStrainer('a', class_=lambda c: c is not None and cls in c.split(), href=True))
+    return [a['href'] for a in soup.find_all('a')]
+
+
+def page_text(html, keyword=None):
+    """Return the visible text of a page, or None if keyword isn't one of its strings
+
+    The raw html is checked for the keyword first, so most non-matching pages are
+    rejected without being parsed at all.
+    """
+
+    if keyword and keyword not in html:
+        return None
+
+    if HTMLParser:
+        tree = HTMLParser(html)
+        tree.strip_tags(['script', 'style', 'noscript'])
+        text = tree.root.text(separator='\n') if tree.root else ''
+    else:
+        soup = make_soup(html)
+        for tag in soup(['script', 'style', 'noscript']):
+            tag.decompose()
+        text = soup.get_text('\n')
+
+    if keyword and keyword not in (line.strip() for line in text.split('\n')):
+        return None
+    return text
+
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import asyncio
+from decouple import config
+from playwright.async_api import Error
+from throttle import classify, limiter as shared_limiter, retry_after
+from timing import span
+
+# env vars
+fetch_concurrency = config('FETCH_CONCURRENCY', default=8, cast=int)
+
+
+async def aiterate(urls):
+    """Iterate over a plain or async iterable of urls"""
+
+    if hasattr(urls, '__aiter__'):
+        async for url in urls:
+            yield url
+    else:
+        for url in urls:
+            yield url
+
+
+async def fetch_all(request, urls, concurrency=fetch_concurrency, limiter=None, headers=None):
+    """Fetch urls concurrently, yielding (url, html) pairs as soon as each one completes
+
+    `request` is a playwright APIRequestContext (e.g. `page.context.request`), so the
+    fetches share the browser's cookies without blocking the event loop. `urls` may be
+    a plain iterable or an async iterable, which lets fetching start while the urls are
+    still being scraped. Requests go through the shared AdaptiveLimiter, and throttled or
+    failed ones are retried after a jittered backoff. html is None when every attempt fails.
+    """
+
+    limiter = limiter or shared_limiter
+    pending = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue()
+    retries = set()
+    outstanding = 0
+
+    async def feed():
+        nonlocal outstanding
+        try:
+            async for url in aiterate(urls):
+                outstanding += 1
+                await pending.put((url, 0))
+        finally:
+            # no more urls, but retries may still be on their way
+            await results.put(None)
+
+    async def retry(url, attempt, delay):
+        await asyncio.sleep(delay)
+        await pending.put((url, attempt))
+
+    async def fetch(url):
+        """Return (outcome, html, retry-after seconds)"""
+
+        with span('fetch.throttle_wait'):
+            await limiter.acquire(url)
+        outcome, html, wait = 'error', None, None
+        try:
+            with span('fetch.request'):
+                response = await request.get(url, headers=headers)
+                outcome, wait = classify(response.status), retry_after(response.headers)
+                if outcome == 'ok':
+                    html = await response.text()
+        except Error as e:
+            outcome = 'redirect_loop' if 'redirect' in str(e).lower() else 'error'
+        finally:
+            limiter.release(url, outcome, wait)
+        return outcome, html, wait
+
+    async def worker():
+        while True:
+            url, attempt = await pending.get()
+            html, retrying = None, False
+            try:
+                outcome, html, wait = await fetch(url)
+                if limiter.should_retry(outcome, attempt):
+                    limiter.count_retry(url)
+                    task = asyncio.create_task(retry(url, attempt + 1, limiter.backoff(attempt, wait)))
+                    retries.add(task)
+                    task.add_done_callback(retries.discard)
+                    retrying = True
+            except Exception as e:
+                # a failed fetch, not a dead worker
+                print(f"ERROR: fetching {url} raised {type(e).__name__}: {e}")
+            finally:
+                # every url yields exactly once, or the loop below waits on it forever
+                if not retrying:
+                    results.put_nowait((url, html))
+
+    feeder = asyncio.create_task(feed())
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+
+    try:
+        feeding = True
+        while feeding or outstanding:
+            item = await results.get()
+            if item is None:
+                feeding = False
+                continue
+            outstanding -= 1
+            yield item
+        # surface errors raised while producing urls
+        await feeder
+    finally:
+        for task in [feeder, *workers, *retries]:
+            task.cancel()
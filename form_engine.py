@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+from collections import namedtuple
+
+# a form field spec
+# * strategy: how to find the element (testid, id, name, css, label, text, button)
+#   testid/id/label/button patterns must match the whole value; text patterns match anywhere in a label
+# * action: what to do with it (fill, select, check, upload, click)
+Field = namedtuple('Field', 'name strategy selector action value', defaults=('',))
+
+# find every field in one pass, fill/select/check them in place, and tag upload/click targets
+fill_script = """
+(specs) => {
+    const report = {};
+    const norm = (s) => (s || '').replace(/\\s+/g, ' ').trim();
+    const exact = (pattern) => new RegExp(`^(?:${pattern})$`);
+    const control = (label) => label.control || label.querySelector('input, select, textarea') || label;
+
+    const candidates = ({strategy, selector}) => {
+        switch (strategy) {
+            case 'testid': {
+                const re = exact(selector);
+                return [...document.querySelectorAll('[data-testid]')].filter(el => re.test(el.dataset.testid));
+            }
+            case 'id': {
+                const re = exact(selector);
+                return [...document.querySelectorAll('[id]')].filter(el => re.test(el.id));
+            }
+            case 'name':
+                return [...document.querySelectorAll(`[name="${CSS.escape(selector)}"]`)];
+            case 'css':
+                return [...document.querySelectorAll(selector)];
+            case 'label': {
+                const re = exact(selector);
+                const labels = [...document.querySelectorAll('label')]
+                    .filter(l => re.test(norm(l.textContent).replace(/\\s*\\*$/, '')));
+                return [
+                    ...labels.map(control),
+                    ...[...document.querySelectorAll('[aria-label]')].filter(el => re.test(norm(el.getAttribute('aria-label')))),
+                ];
+            }
+            case 'text': {
+                const re = new RegExp(selector);
+                return [...document.querySelectorAll('label')].filter(l => re.test(norm(l.textContent))).map(control);
+            }
+            case 'button': {
+                const re = exact(selector);
+                return [...document.querySelectorAll('button, [role=button], input[type=submit]')]
+                    .filter(el => re.test(norm(el.textContent || el.value)));
+            }
+        }
+        return [];
+    };
+
+    // an earlier step can linger hidden in the DOM, so prefer what's on screen
+    // (file inputs are usually hidden behind a button, hence the fallback)
+    const visible = (el) => el.getClientRects().length > 0;
+    const find = (spec) => {
+        const found = candidates(spec);
+        return found.find(visible) || found[0];
+    };
+
+    // use the native setter so frameworks like React see the change
+    const setValue = (el, value) => {
+        const setter = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), 'value')?.set;
+        setter ? setter.call(el, value) : (el.value = value);
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+    };
+
+    // steps can change without a navigation, so drop the previous step's tags first
+    document.querySelectorAll('[data-form-field]').forEach(el => el.removeAttribute('data-form-field'));
+
+    for (const spec of specs) {
+        let el = find(spec);
+        report[spec.name] = Boolean(el);
+        if (!el) continue;
+
+        switch (spec.action) {
+            case 'fill':
+                setValue(el, spec.value);
+                break;
+            case 'select': {
+                const option = [...(el.options || [])]
+                    .find(o => o.value === spec.value || norm(o.textContent) === spec.value);
+                report[spec.name] = Boolean(option);
+                if (option) setValue(el, option.value);
+                break;
+            }
+            case 'check':
+                if (!el.checked) el.click();
+                break;
+            case 'upload':
+                if (!el.matches('input[type=file]')) {
+                    el = el.querySelector('input[type=file]') || document.querySelector('input[type=file]');
+                }
+                report[spec.name] = Boolean(el);
+                if (el) el.setAttribute('data-form-field', spec.name);
+                break;
+            case 'click':
+                el.setAttribute('data-form-field', spec.name);
+                break;
+        }
+    }
+    return report;
+}
+"""
+
+
+async def fill_form(page, fields):
+    """Fill out a form step from a list of Field specs
+
+    Every field is located (and filled, selected or checked) in a single in-page evaluation.
+    Only file uploads and button clicks go through playwright afterwards, in spec order.
+    Returns {field name: matched} so skipped fields are easy to spot.
+    """
+
+    report = await page.evaluate(fill_script, [field._asdict() for field in fields])
+
+    for field in fields:
+        if not report.get(field.name):
+            continue
+        target = page.locator(f'[data-form-field="{field.name}"]')
+        if field.action == 'upload':
+            await target.set_input_files(field.value)
+        elif field.action == 'click':
+            await target.click()
+
+    return report
@@ -1,17 +1,18 @@
 #!/usr/bin/env python3
 
 # import json
-import urllib.request
 import re
-import subprocess
-import time
-from bs4 import BeautifulSoup
 from decouple import config
+from extract import job_links
+from listing_cache import ListingCache, listing_id
+from resolver import resolve_urls
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from throttle import limiter
+from timing import span
 # from selenium.webdriver.common.keys import Keys
 # from selenium.webdriver.common.action_chains import ActionChains
 
@@ -22,6 +23,13 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 position_title = config('POSITION_TITLE', default='Software Engineer')
 location = config('LOCATION', default='San Francisco, CA')
 
+# reuse a running, logged-in browser instead of cold-starting one
+# * CHROME_DEBUGGER: host:port of a chrome started with --remote-debugging-port (e.g. 127.0.0.1:9222)
+# * CHROME_PROFILE: user-data dir to launch chrome with, so the glassdoor session survives between runs
+debugger_address = config('CHROME_DEBUGGER', default='')
+user_data_dir = config('CHROME_PROFILE', default='')
+page_timeout = config('PAGE_TIMEOUT', default=20, cast=int)
+
 # fill this in with your job preferences!
 PREFERENCES = {
     "position_title": position_title,
@@ -61,8 +69,10 @@ def go_to_listings(driver):
         location_field.clear()
         location_field.send_keys(PREFERENCES['location'])
 
-        # wait for a little so location gets set
-        time.sleep(1)
+        # wait until the location is set rather than for a fixed time
+        WebDriverWait(driver, page_timeout).until(
+            lambda d: location_field.get_attribute('value') == PREFERENCES['location']
+        )
         driver.find_element_by_xpath(" //*[@id='scBar']/div/button").click()
 
         # close a random popup if it shows up
@@ -78,29 +88,31 @@ def go_to_listings(driver):
         return False
 
 
-def aggregate_links(driver):
+def aggregate_links(driver, cache=None):
     """aggregate all url links in a set"""
 
     all_links = [] # all hrefs that exist on the page
 
-    # wait for page to fully load
-    element = WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.XPATH, "//*[@id='MainCol']/div[1]/ul"))
-        )
-
-    time.sleep(5)
-
-    # parse the page source using beautiful soup
-    page_source = driver.page_source
-    soup = BeautifulSoup(page_source)
+    # wait for the job list and its links instead of a fixed sleep
+    with span('scrape.wait_links'):
+        WebDriverWait(driver, page_timeout).until(
+                EC.presence_of_element_located((By.XPATH, "//*[@id='MainCol']/div[1]/ul"))
+            )
+        try:
+            WebDriverWait(driver, page_timeout).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "#MainCol a.job_link"))
+            )
+        except TimeoutException:
+            print(f"No job links found on {driver.current_url}")
 
-    # find all hrefs
-    all_job_links = soup.findAll("a", {"class": "job_link"})
-    all_links = [job_link['href'] for job_link in all_job_links]
+    # find all hrefs, parsing only the job link tags
+    with span('scrape.extract_links'):
+        page_source = driver.page_source
+        all_links = job_links(page_source, cls='job_link')
     all_fixed_links = []
 
-    # clean up the job links by opening, modifying, and 'unraveling' the URL
-    for link in all_links:
+    # clean up the job links by modifying and 'unraveling' the URL
+    for i, link in enumerate(all_links):
         # first, replace GD_JOB_AD with GD_JOB_VIEW
         # this will replace the Glassdoor hosted job page to the proper job page
         # hosted on most likely Greenhouse or Lever
@@ -108,51 +120,84 @@ def aggregate_links(driver):
 
         # if there is no glassdoor prefex, add that
         # for example, /partner/jobListing.htm?pos=121... needs the prefix
-
         if link[0] == '/':
             link = f"https://www.glassdoor.com{link}"
 
-        # then, open up each url and save the result url
-        # because we got a 403 error when opening this normally, we have to establish the user agent
-        user_agent = 'Mozilla/5.0 (Windows; U; Windows NT 5.1; en-US; rv:1.9.0.7) Gecko/2009021910 Firefox/3.0.7'
-        headers={'User-Agent': user_agent}
-        request=urllib.request.Request(link, None, headers) # The assembled request
+        all_links[i] = link
 
-        try:
-            # the url is on glassdoor itself, but once it's opened, it redirects - so let's store that
-            response = urllib.request.urlopen(request)
-            new_link = response.geturl()
-
-            # if the result url is from glassdoor, it's an 'easy apply' one and worth not saving
-            # however, this logic can be changed if you want to keep those
-            if "glassdoor" not in new_link:
-                print(new_link)
-                print('\n')
-                all_fixed_links.append(new_link)
-        except Exception:
-            # horrible way to catch errors but this doesnt happen regularly (just 302 HTTP error)
+    # listings resolved on a previous run skip the network entirely
+    unresolved = []
+    for link in all_links:
+        job_id = listing_id(link)
+        row = cache.get(job_id, 'resolve') if cache else None
+        if row is None:
+            unresolved.append(link)
+            continue
+        cache.seen(job_id)
+        if row['verdict'] == 'keep':
+            all_fixed_links.append(row['url'])
+
+    # the url is on glassdoor itself, but once it's opened, it redirects - so let's store that
+    # redirects are followed concurrently without downloading the response bodies
+    for link, new_link in resolve_urls(unresolved):
+        if new_link is None:
+            # throttled and failed lookups have already been retried with backoff
             print(f"ERROR: failed for {link}\n")
+            continue
+
+        # if the result url is from glassdoor, it's an 'easy apply' one and worth not saving
+        # however, this logic can be changed if you want to keep those
+        verdict = 'skip' if "glassdoor" in new_link else 'keep'
+
+        if cache:
+            cache.put(listing_id(link), new_link, verdict, 'resolve')
+
+        if verdict == 'keep':
+            print(new_link)
+            print('\n')
+            all_fixed_links.append(new_link)
 
     # convert to a set to eliminate duplicates
     return set(all_fixed_links)
 
 
+def make_driver():
+    """attach to a running browser if one is configured, otherwise launch chrome"""
+    options = webdriver.ChromeOptions()
+    if debugger_address:
+        options.add_experimental_option("debuggerAddress", debugger_address)
+    elif user_data_dir:
+        options.add_argument(f"--user-data-dir={user_data_dir}")
+
+    # chromedriver is found on the PATH
+    return webdriver.Chrome(options=options)
+
+
+def close_driver(driver):
+    """close the browser we launched, but leave an attached one running"""
+    if debugger_address:
+        driver.service.stop()
+    else:
+        driver.quit()
+
+
 def get_urls():
     """'main' method to iterate through all pages and aggregate URLs"""
-    chrome_bin = subprocess.run(["which", "chromedriver"], stdout=subprocess.PIPE).stdout.decode('utf-8').strip()
-
-    driver = webdriver.Chrome(executable_path=chrome_bin)
+    driver = make_driver()
 
     success = login(driver)
 
     if not success:
         # close the page if it gets stuck at some point - this logic can be improved
-        driver.close()
+        close_driver(driver)
 
     success = go_to_listings(driver)
 
     if not success:
-        driver.close()
+        close_driver(driver)
+
+    # resolved listings persist between runs, keyed by listing ID
+    cache = ListingCache()
 
     all_links = set()
     page = 1
@@ -163,7 +208,7 @@ def get_urls():
         # on the first page, the URL is unique and doesn't have a field for the page number
         if page == 1:
             # aggregate links on first page
-            all_links.update(aggregate_links(driver))
+            all_links.update(aggregate_links(driver, cache))
 
             # find next page button and click it
             next_page = driver.find_element_by_xpath("//*[@id='FooterPageNav']/div/ul/li[3]/a")
@@ -178,14 +223,14 @@ def get_urls():
             # to: .../jobs-SRCH_IL.0,13_IC1147401_KE14,33_IP2.htm
             page += 1 # increment page count
             next_url = f"{m.group('url')}_IP{page}.htm" # update url with new page number
-            time.sleep(1) # just to give things time
 
         # same patterns from page 2 onwards
         if page >= 2 :
             # open page with new URL
-            driver.get(next_url)
+            with span('scrape.goto'):
+                driver.get(next_url)
             # collect all the links
-            all_links.update(aggregate_links(driver))
+            all_links.update(aggregate_links(driver, cache))
             # run regex to get all reusable parts of URL
             m = re.search('(?P<url>[^;]*?)(?P<pagenum>.)(?P<html>.htm)', next_url)
             # increment page number for next time
@@ -193,7 +238,9 @@ def get_urls():
             # update URL
             next_url = f"{m.group('url')}{page}.htm"
 
-    driver.close()
+    cache.close()
+    close_driver(driver)
+    print(limiter.report())
     return all_links
 
 
@@ -1,32 +1,82 @@
 #!/usr/bin/env python3
 
 import asyncio
-import json
-import re
-import requests
-import requests_cache
 import time
 import typer
-from bs4 import BeautifulSoup
-from decouple import config, UndefinedValueError
-from pathlib import Path
+from blocker import RequestBlocker
+from browser_pool import ContextPool, lease_page
+from decouple import config, Csv, UndefinedValueError
+from export_store import ExportStore
+from export_stream import ats, ExportWriter
+from extract import page_text
+from fetcher import aiterate, fetch_all
+from har import HarSession
+from listing_cache import ListingCache, inputs_hash, listing_id
+from matcher import TermMatcher
 from playwright.async_api import async_playwright, TimeoutError
+from search_api import api_timeout, is_search_response, search_mode, SearchApi
+from throttle import limiter
+from timing import span, timed
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 
 # env vars
 url = config(
     'URL',
     default='https://www.glassdoor.com/profile/login_input.htm'
 )
-headless_toggle = config('HEADLESS', default=False, cast=bool)  # default is False
+# site root for listing links (pointed at a local server by bench.py)
+base_url = config('GLASSDOOR_URL', default='https://www.glassdoor.com')
 username = config('USERNAME', default='spiritualized@gmail.com')
 password = config('PASSWORD', default='correcthorsebatterystaple')
 first_name = config('FIRST_NAME', default='Yosemite')
 last_name = config('LAST_NAME', default='Sam')
 
+# filter terms (comma-separated, matched as whole words)
+stop_words = config(
+    'STOP_WORDS',
+    default='.net,chef,hadoop,java,junior,powershell,puppet,saltstack,teamcity',
+    cast=Csv()
+)
+include_words = config('INCLUDE_WORDS', default='', cast=Csv())
+
+# pagination caps (0 means no limit)
+max_pages = config('MAX_PAGES', default=0, cast=int)
+max_results = config('MAX_RESULTS', default=0, cast=int)
+
+# search filters added to the results url
+# * age of posting (7/14/30 days)
+# * minimum salary (100k+)
+# * maximum salary (320k+)
+# * application type (easy apply)
+# * include no salary jobs (false)
+search_filters = {
+    "fromAge": 14,
+    "minSalary": 100000,
+    "maxSalary": 320000,
+    "applicationType": 1,
+    "includeNoSalaryJobs": "false",
+}
+
 # # set timeout (e.g., *.click(timeout=10000)))
 # sec = 30
 # timeout = sec * 1000
 
+# href, title and company of every job link on a results page
+listing_script = """
+els => els.map(el => {
+    const card = el.closest('li');
+    const employer = card && card.querySelector('[data-test="employer-short-name"], .jobEmpolyerName');
+    return {
+        href: el.getAttribute('href'),
+        title: (card && card.dataset.normalizeJobTitle) || el.textContent.trim() || null,
+        company: employer ? employer.textContent.trim() : null,
+    };
+})
+"""
+
+# what the results page shows: changes once the pager has moved on, whether it navigated or re-rendered
+page_marker = "() => location.href + ' ' + (document.querySelector('a.jobLink')?.getAttribute('href') || '')"
+
 headers = {
     'Access-Control-Allow-Origin': '*',
     'Access-Control-Allow-Methods': 'GET',
@@ -35,12 +85,14 @@ headers = {
     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36'
 }
 
-# set up requests cache
-requests_cache.install_cache(
-    cache_name='glassdoor_cache',
-    backend='sqlite',
-    expire_after=86400
-)
+
+def with_filters(url, filters=search_filters):
+    """Merge search filters into a url's querystring, replacing any already there"""
+
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update({key: str(value) for key, value in filters.items()})
+    return urlunsplit(parts._replace(query=urlencode(query)))
 
 
 async def job_prefs():
@@ -58,84 +110,73 @@ async def job_prefs():
     return position_title, location
 
 
-# create exports directory
-Path("exports").mkdir(parents=True, exist_ok=True)
-
-
 class Driver:
     """Driver class to handle all browser interactions"""
 
-    def __init__(self, playwright, url, *args, **kwargs):
+    def __init__(self, playwright, url, *args, pool=None, query=None, save_state=True, **kwargs):
         self.playwright = playwright
         self.url = url
+        self.pool = pool
+        # (position title, location) to search for, instead of the POSITION_TITLE/LOCATION prefs
+        self.query = query
+        self.save_state = save_state
         self.args = args
         self.kwargs = kwargs
+        self.cache = ListingCache()
+        self.har = HarSession(kwargs.get('action', 'run'), self.har_key(), mode='')
+        # the filtered search's results api response, with SEARCH_MODE=api
+        self.search_response = None
+
+
+    def har_key(self):
+        # each search gets its own recording
+        return f"{self.url}#{'|'.join(self.query)}" if self.query else self.url
 
 
     async def run(self):
-        options = {
-            "args": [
-                '--disable-blink-features=AutomationControlled',
-                '--disable-gpu',
-                '--disable-dev-shm-usage',
-                '--disable-setuid-sandbox',
-                '--no-first-run',
-                '--no-sandbox',
-                '--no-zygote',
-                '--ignore-certificate-errors',
-                '--disable-extensions',
-                '--disable-infobars',
-                '--disable-notifications',
-                '--disable-popup-blocking',
-                '--remote-debugging-port=9222'
-            ],
-            "headless": headless_toggle,
-            "slow_mo": 100,
-            "devtools": False,
-        }
-        browser = await self.playwright.chromium.launch(**options)
-        state = Path("playwright/.auth/state.json")
-        if state.is_file():
-            context = await browser.new_context(
-                viewport={"width":1280,"height":1400},
-                storage_state=state._str
-            )
-        else:
-            context = await browser.new_context(
-                viewport={"width":1280,"height":1400}
-            )
-        page = await context.new_page()
+        # record or replay this flow's traffic when HAR_MODE is set
+        self.har = HarSession(self.kwargs.get('action', 'run'), self.har_key())
 
-        # page.set_default_timeout(timeout)
+        # launch a browser for this run unless one is shared across runs
+        try:
+            async with lease_page(
+                self.playwright, self.pool, self.har, self.save_state, headers=headers, blocker=RequestBlocker()
+            ) as page:
+                return await self.dispatch(page)
+        finally:
+            self.cache.close()
 
-        await page.set_extra_http_headers(headers)
 
-        await page.goto(self.url)
+    async def dispatch(self, page):
+        """Run the requested action on a leased page"""
+
+        # page.set_default_timeout(timeout)
 
-        # save state (cookies, local storage, etc.)
-        await context.storage_state(path=state._str)
+        with span('scrape.goto'):
+            await page.goto(self.url)
 
         # run class methods
+        result = None
         if self.kwargs:
             if self.kwargs['action'] == 'login':
-                await self.login(page)
+                result = await self.login(page)
             elif self.kwargs['action'] == 'go_to_listings':
-                await self.go_to_listings(page)
+                result = await self.go_to_listings(page)
             elif self.kwargs['action'] == 'aggregate_links':
-                await self.aggregate_links(page)
+                result = await self.aggregate_links(page)
             elif self.kwargs['action'] == 'get_urls':
-                await self.get_urls(page)
+                result = await self.get_urls(page)
+            elif self.kwargs['action'] == 'get_listings':
+                result = await self.get_listings(page)
             elif self.kwargs['action'] == 'filter_urls':
-                await self.filter_urls(page, keyword='Easy Apply')
+                result = await self.filter_urls(page, keyword='Easy Apply')
             elif self.kwargs['action'] == 'export_urls':
-                await self.export_urls(page)
+                result = await self.export_urls(page)
 
         # ! pause for debugging
         # await page.pause()
 
-        # close browser
-        await context.close()
-        await browser.close()
+        return result
 
 
     async def login(self, page):
@@ -153,75 +194,169 @@ class Driver:
             return True
 
 
+    @timed('scrape.search')
     async def go_to_listings(self, page):
         """Navigate to job listing page"""
 
-        print('Navigating to listings...')
-        await page.goto('https://www.glassdoor.com/Job/jobs.htm')
+        title, where = self.query or (position_title, location)
+
+        print(f'Navigating to listings for {title} in {where}...')
+        await page.goto(f'{base_url}/Job/jobs.htm')
+        await self.har.step(page, 'search')
 
         # TODO: debug `waiting for locator("[data-test=\"search-bar-keyword-input\"]")`
         # ! can't run headless as it times out / never appears
         try:
             # fill out position and location fields
-            await page.get_by_placeholder("Find your perfect job").fill(position_title)
+            await page.get_by_placeholder("Find your perfect job").fill(title)
             await page.get_by_label("Search location").press("Meta+a")
-            await page.get_by_label("Search location").fill("remote us")
-            await page.get_by_role("option", name=location).locator("div").click()
+            await page.get_by_label("Search location").fill(where)
+            await page.get_by_role("option", name=where).locator("div").click()
 
             # TODO: QA (148 jobs when run manually 7/6/23)
             # !https://www.glassdoor.com/Job/remote-python-developer-jobs-SRCH_IL.0,6_IS11047_KO7,23.htm?jobType=fulltime&fromAge=14&minSalary=100000&maxSalary=320000&applicationType=1&locName=Remote&includeNoSalaryJobs=false
-            # append querystring to url
-            # * age of posting (7/14/30 days)
-            # * minimum salary (100k+)
-            # * maximum salary (320k+)
-            # * application type (easy apply)
-            # * include no salary jobs (false)
-            # * location (remote)
-            await page.goto(page.url
-                            + '?fromAge=14'
-                            + '?minSalary=100000'
-                            + '&maxSalary=320000'
-                            + '&applicationType=1'
-                            + '&includeNoSalaryJobs=false'
-                            + '&locName=Remote'
-            )
+            # the location is already in the results url's path
+            await self.load_results(page, with_filters(page.url))
         except TimeoutError:
             pass
 
 
-    async def aggregate_links(self, page):
-        """Aggregate all URL links"""
+    async def load_results(self, page, url):
+        """Open a results page, keeping its search api response when SEARCH_MODE=api"""
+
+        if search_mode != 'api':
+            await page.goto(url)
+            return
 
+        # only this navigation's response has the filters applied
+        async with page.expect_response(is_search_response, timeout=api_timeout) as response:
+            await page.goto(url)
+        self.search_response = await response.value
+
+
+    async def search(self, page):
+        """Run the search, returning a SearchApi on its results response when SEARCH_MODE=api"""
+
+        self.search_response = None
         await self.go_to_listings(page)
 
-        all_links = set()
+        if search_mode != 'api':
+            return None
+        if self.search_response is None:
+            print("No search API response, scraping the results pages instead")
+            return None
 
-        # get all links on page
-        links = await page.query_selector_all("a.jobLink")
-        for link in links:
-            all_links.add(await link.get_attribute("href"))
+        api = SearchApi(page, self.search_response, self.har)
+        if await api.first() is None:
+            print("Couldn't read the search API response, scraping the results pages instead")
+            return None
+        return api
 
-        # get next page
-        try:
-            next_page = await page.query_selector("li.next")
-            await next_page.click()
-            await page.wait_for_load_state("networkidle")
-            all_links.union(self.aggregate_links(page))
-        except Exception:
-            pass
+
+    async def iter_pages(self, page, max_pages=max_pages, max_results=max_results):
+        """Yield the job links on each results page as soon as it loads"""
+
+        # only search once; later pages come from the search api or the pager
+        api = await self.search(page)
+        pages = api.pages() if api else self.iter_result_pages(page)
+
+        count = 0
+        page_num = 0
+
+        async for links in pages:
+            page_num += 1
+            if max_results:
+                links = links[:max_results - count]
+            count += len(links)
+
+            yield links
+
+            if max_pages and page_num >= max_pages:
+                break
+            if max_results and count >= max_results:
+                break
+
+
+    async def iter_result_pages(self, page):
+        """Yield the job links on each rendered results page, clicking through the pager"""
+
+        page_num = 0
+
+        while True:
+            page_num += 1
+            await self.har.step(page, f'results-{page_num}')
+
+            # get all links on page in a single round trip
+            with span('scrape.extract_links'):
+                links = await page.eval_on_selector_all("a.jobLink", listing_script)
+            yield links
+
+            # get next page (the pager item is wider than its link, so click the link itself)
+            next_page = await page.query_selector("li.next a, li.next button") or await page.query_selector("li.next")
+            if next_page is None:
+                break
+            try:
+                with span('scrape.next_page'):
+                    # networkidle can be reached before the click has done anything
+                    marker = await page.evaluate(page_marker)
+                    await next_page.click()
+                    await page.wait_for_function(f"marker => ({page_marker})() !== marker", arg=marker)
+                    await page.wait_for_load_state()
+            except TimeoutError:
+                print(f"Results page {page_num + 1} didn't load, stopping")
+                break
+
+
+    async def aggregate_links(self, page):
+        """Aggregate all URL links"""
+
+        all_links = set()
+
+        async for links in self.iter_pages(page):
+            all_links.update(link['href'] for link in links)
 
         return all_links
 
 
+    async def iter_listings(self, page):
+        """Yield an export record per listing, page by page, as the results are paginated"""
+
+        async for links in self.iter_pages(page):
+            for link in links:
+                url = urljoin(base_url, link['href'])
+                job_id = link.get('listing_id') or listing_id(url)
+                self.cache.seen(job_id)
+                listing = {
+                    "url": url,
+                    "listing_id": job_id,
+                    "ats": ats(url),
+                    "title": link['title'],
+                    "company": link['company'],
+                }
+                # the search api also has the salary range and whether it's easy apply
+                listing.update({key: link[key] for key in ('salary', 'easy_apply') if key in link})
+                yield listing
+
+
+    async def get_listings(self, page):
+        """Return the export record of every listing in the search results"""
+
+        return [listing async for listing in self.iter_listings(page)]
+
+
+    async def iter_urls(self, page):
+        """Yield absolute listing URLs page by page, as the results are paginated"""
+
+        async for listing in self.iter_listings(page):
+            yield listing['url']
+
+
     async def get_urls(self, page):
         """Create a set of all URLs"""
 
-        all_links = await self.aggregate_links(page)
-
         all_urls = set()
 
-        for link in all_links:
-            url = 'https://www.glassdoor.com' + link
+        async for url in self.iter_urls(page):
             all_urls.add(url)
 
         return all_urls
@@ -229,78 +364,112 @@ class Driver:
 
     # TODO: debug empty return
     # ! skip pages with 'Applied MMM DD, YYYY' text
-    async def filter_urls(self, page, keyword=None, exclude=None):
+    async def filter_urls(self, page, keyword=None, exclude=None, include=None):
         """Filter URLs by keyword(s)"""
 
-        stop_words = [
-            '.net',
-            'chef',
-            'hadoop',
-            'java',
-            'junior',
-            'powershell',
-            'puppet',
-            'saltstack',
-            'teamcity',
-        ]
+        # compile the filter terms once per run
+        exclude_terms = TermMatcher(stop_words + [exclude or ''])
+        include_terms = TermMatcher(include_words + [include or ''])
 
-        if exclude:
-            stop_words.append(exclude)
+        filtered_urls = set()
 
-        all_urls = await self.get_urls(page)
+        # listings are fetched while later result pages are still loading
+        urls = self.iter_urls(page)
 
-        filtered_urls = set()
+        async for url in self.stream_filtered(page, urls, keyword, exclude_terms, include_terms):
+            filtered_urls.add(url)
+
+        print(limiter.report())
+        return filtered_urls
+
+
+    async def stream_filtered(self, page, urls, keyword, exclude_terms, include_terms=None):
+        """Yield URLs that pass the filter as soon as each listing has been fetched"""
 
-        for url in all_urls:
-            r = requests.get(url, headers=headers)
-            html = BeautifulSoup(r.content, 'html.parser')
-            keyword_match = html.find_all(string=keyword, limit=1)
-            if keyword_match != []:
-                body = html.currentTag.text
-                # skip pages with stop words
-                if any(word in body.lower() for word in stop_words):
-                    job_id = re.search(r'jobListingId=(\d+)', url).group(1)
-                    text = f"Skipping job #{job_id} ..."
+        known = []
+        queued = set()
+        # verdicts decided with other filter terms don't hold for this run
+        inputs = inputs_hash(keyword, exclude_terms.terms, include_terms.terms if include_terms else [])
+
+        # listings filtered on a previous run skip the network entirely
+        async def unknown_urls():
+            async for url in aiterate(urls):
+                if url in queued:
+                    continue
+                queued.add(url)
+                row = self.cache.get(listing_id(url), 'filter', inputs)
+                if row is None:
+                    yield url
+                elif row['verdict'] == 'keep':
+                    known.append(url)
+
+        async for url, content in fetch_all(page.context.request, unknown_urls(), headers=headers):
+            while known:
+                yield known.pop()
+
+            if content is None:
+                print(f"ERROR: failed for {url}")
+                continue
+
+            job_id = listing_id(url)
+            with span('filter.parse'):
+                body = page_text(content, keyword)
+            if body is not None:
+                # skip pages with stop words, or without any of the required words
+                with span('filter.match'):
+                    hits = exclude_terms.findall(body)
+                    missing = include_terms and not include_terms.search(body)
+                if hits or missing:
+                    reason = ', '.join(sorted(hits)) or 'no required words'
+                    text = f"Skipping job #{job_id} ({reason}) ..."
                     target = url
                     # https://stackoverflow.com/a/53658415/15454191
                     print(f"\x1b]8;;{target}\a{text}\x1b]8;;\a")
+                    self.cache.put(job_id, url, 'skip', 'filter', inputs)
                     continue
                 else:
-                    filtered_urls.add(url)
+                    self.cache.put(job_id, url, 'keep', 'filter', inputs)
+                    yield url
+            else:
+                self.cache.put(job_id, url, 'skip', 'filter', inputs)
 
-        return filtered_urls
+        while known:
+            yield known.pop()
 
 
     async def export_urls(self, page):
-        """Export urls to a JSON file"""
-
-        all_urls = await self.get_urls(page)
-
-        # filter URLs by keyword
-        # all_urls = await self.filter_urls(page, keyword='Easy Apply')
+        """Stream listings to an NDJSON export as they're scraped"""
 
-        if len(all_urls) == 0:
-            print("No URLs to export.")
-            return
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
 
-        print(f"Exporting {len(all_urls)} URLs...")
+        fn = f"urls_{timestamp}.jsonl"
 
-        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+        print(f"Exporting URLs to {fn}...")
 
-        fn = f"urls_{timestamp}.json"
+        # one record per line, appended as each results page loads
+        # the store dedupes against every earlier run for apply
+        new = 0
+        with ExportWriter(f"exports/{fn}") as export, ExportStore() as store:
+            store.start_run()
+            async for listing in self.iter_listings(page):
+                if export.write(listing) and store.add(listing):
+                    new += 1
+            store.finish_run()
 
-        with open(f"exports/{fn}", 'w') as f:
-            json.dump(list(all_urls), f, indent=2)
+        if export.count == 0:
+            print("No URLs to export.")
+            return
 
-        print(f"Exported {len(all_urls)} URLs to {fn}")
+        print(f"Exported {export.count} URLs ({new} new) to {fn}")
 
 
 async def main(url, *args, **kwargs):
     position_title, location = await job_prefs()
 
     async with async_playwright() as playwright:
-        driver = Driver(playwright, url, *args, **kwargs)
-        await driver.run()
+        async with ContextPool(playwright, headers=headers, blocker=RequestBlocker()) as pool:
+            driver = Driver(playwright, url, *args, pool=pool, **kwargs)
+            return await driver.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import time
+from decouple import config
+from pathlib import Path
+
+# env vars
+har_mode = config('HAR_MODE', default='')                   # record, replay, or empty to use the live site
+har_dir = Path(config('HAR_DIR', default='playwright/har'))
+har_not_found = config('HAR_NOT_FOUND', default='abort')    # replay: abort requests missing from the HAR, or fallback to the network
+har_step = config('HAR_STEP', default='')                   # replay: start the flow at this recorded step
+
+
+class HarSession:
+    """Record one flow's browser traffic to a HAR file, or serve it back from one
+
+    Each flow/url pair gets its own directory under HAR_DIR with the HAR, an html
+    snapshot per step, and steps.json (step name, url, seconds into the session).
+    HAR_DIR/index.json lists every recording so a single flow can be replayed on its own.
+    """
+
+    def __init__(self, flow, url, mode=har_mode, root=har_dir):
+        self.flow = flow
+        self.url = url
+        self.mode = mode
+        self.root = Path(root)
+        self.name = f"{flow}-{hashlib.sha1(url.encode()).hexdigest()[:8]}"
+        self.dir = self.root / self.name
+        self.path = self.dir / "session.har"
+        self.steps = []
+        self.start = time.monotonic()
+
+
+    def __bool__(self):
+        return self.mode in ('record', 'replay')
+
+
+    def context_options(self):
+        """Extra browser.new_context() options for this session"""
+
+        if self.mode != 'record':
+            return {}
+        self.dir.mkdir(parents=True, exist_ok=True)
+        return {
+            "record_har_path": str(self.path),
+            "record_har_mode": "full",
+            "record_har_content": "embed",
+        }
+
+
+    async def install(self, context):
+        """Serve the context's requests from the recording when replaying"""
+
+        if self.mode != 'replay':
+            return
+        if not self.path.is_file():
+            raise FileNotFoundError(f"No recording for {self.flow} at {self.path}, run with HAR_MODE=record first")
+        await context.route_from_har(self.path, not_found=har_not_found)
+
+
+    async def step(self, page, name):
+        """Mark the start of a step, snapshotting the page when recording"""
+
+        if self.mode != 'record':
+            return
+        snapshot = self.dir / f"{len(self.steps):02d}-{name}.html"
+        snapshot.write_text(await page.content())
+        self.steps.append({
+            "step": name,
+            "url": page.url,
+            "snapshot": snapshot.name,
+            "at": round(time.monotonic() - self.start, 3),
+        })
+
+
+    def step_url(self, name):
+        """Return the recorded url of a step, to jump straight to it on replay"""
+
+        with open(self.dir / "steps.json") as f:
+            for step in json.load(f)["steps"]:
+                if step["step"] == name:
+                    return step["url"]
+        raise KeyError(f"{self.name} has no recorded step {name!r}")
+
+
+    def save(self):
+        """Write the step index once the context is closed and the HAR is on disk"""
+
+        if self.mode != 'record':
+            return
+
+        with open(self.dir / "steps.json", 'w') as f:
+            json.dump({"flow": self.flow, "url": self.url, "har": self.path.name, "steps": self.steps}, f, indent=2)
+
+        index_file = self.root / "index.json"
+        index = json.loads(index_file.read_text()) if index_file.is_file() else {}
+        index[self.name] = {
+            "flow": self.flow,
+            "url": self.url,
+            "steps": [step["step"] for step in self.steps],
+            "recorded": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+        }
+        index_file.write_text(json.dumps(index, indent=2))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from decouple import config
+
+# env vars
+cache_path = config('LISTING_CACHE', default='listing_cache.sqlite')
+cache_ttl = config('LISTING_CACHE_TTL', default=604800, cast=int)     # 7 days
+
+schema = """
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id  TEXT PRIMARY KEY,
+    first_seen  REAL NOT NULL,
+    last_seen   REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS verdicts (
+    listing_id  TEXT NOT NULL,
+    scope       TEXT NOT NULL,
+    url         TEXT,
+    verdict     TEXT,
+    inputs      TEXT NOT NULL DEFAULT '',
+    decided_at  REAL NOT NULL,
+    PRIMARY KEY (listing_id, scope)
+);
+"""
+
+
+def listing_id(url):
+    """Extract the Glassdoor listing ID from a job listing URL"""
+
+    m = re.search(r'(?:jobListingId|jl)=(\d+)', url)
+    return m.group(1) if m else None
+
+
+def listing_key(url, job_id=None):
+    """Identify a listing across searches and runs: its listing ID, or the URL when it has none
+
+    Glassdoor listing URLs carry per-search tracking params (pos=, ao=, ...), so the same
+    listing gets a different URL in every search.
+    """
+
+    return job_id or listing_id(url) or url
+
+
+def inputs_hash(*inputs):
+    """Fingerprint whatever a verdict was decided from (keyword, stop words, ...), so changing it invalidates the verdict"""
+
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+class ListingCache:
+    """Persistent index of Glassdoor listing IDs to their verdicts
+
+    Each scraper keeps its verdicts in its own scope, since they mean different things:
+    get_links resolves a listing to its final URL and skips Easy Apply ones, get_links_pw
+    fetches the listing and skips it on the stop and include words. A verdict is only
+    reused while the inputs it was decided from are unchanged.
+    """
+
+    def __init__(self, path=cache_path, ttl=cache_ttl):
+        self.ttl = ttl
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        # sharded scrapes write from several processes at once
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(schema)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+    def get(self, job_id, scope, inputs=''):
+        """Return the verdict on a listing in `scope`, or None if there's none, it expired or `inputs` changed"""
+
+        if job_id is None:
+            return None
+        row = self.conn.execute(
+            "SELECT * FROM verdicts WHERE listing_id = ? AND scope = ?", (job_id, scope)
+        ).fetchone()
+        if row is None or row['inputs'] != inputs:
+            return None
+        if time.time() - row['decided_at'] > self.ttl:
+            return None
+        return row
+
+
+    def seen(self, job_id):
+        """Record that a listing showed up in the results again"""
+
+        if job_id is None:
+            return
+        now = time.time()
+        self.conn.execute(
+            """
+            INSERT INTO listings (listing_id, first_seen, last_seen) VALUES (?, ?, ?)
+            ON CONFLICT (listing_id) DO UPDATE SET last_seen = excluded.last_seen
+            """,
+            (job_id, now, now),
+        )
+        # don't hold the write lock for the rest of the scrape
+        self.conn.commit()
+
+
+    def put(self, job_id, url, verdict, scope, inputs=''):
+        """Store the final URL and verdict on a listing in `scope`, along with the inputs it was decided from"""
+
+        if job_id is None:
+            return
+        now = time.time()
+        self.conn.execute(
+            """
+            INSERT INTO listings (listing_id, first_seen, last_seen) VALUES (?, ?, ?)
+            ON CONFLICT (listing_id) DO UPDATE SET last_seen = excluded.last_seen
+            """,
+            (job_id, now, now),
+        )
+        self.conn.execute(
+            """
+            INSERT INTO verdicts (listing_id, scope, url, verdict, inputs, decided_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (listing_id, scope) DO UPDATE SET
+                url = excluded.url,
+                verdict = excluded.verdict,
+                inputs = excluded.inputs,
+                decided_at = excluded.decided_at
+            """,
+            (job_id, scope, url, verdict, inputs, now),
+        )
+        self.conn.commit()
+
+
+    def purge(self):
+        """Drop verdicts that have expired"""
+
+        self.conn.execute(
+            "DELETE FROM verdicts WHERE decided_at < ?", (time.time() - self.ttl,)
+        )
+        self.conn.commit()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import re
+
+
+class TermMatcher:
+    """Match a list of terms against text in a single pass
+
+    All terms are compiled into one alternation, longest first, anchored so a term only
+    matches as a whole word (e.g. 'java' does not match inside 'javascript'). Only the
+    ends of a term that are word characters are anchored, so '.net' still matches in
+    'ASP.NET' and 'c++' in 'C++17'.
+    """
+
+    def __init__(self, terms):
+        self.terms = sorted({term.strip().lower() for term in terms if term.strip()}, key=len, reverse=True)
+        if self.terms:
+            pattern = '|'.join(self.anchor(term) for term in self.terms)
+            self.regex = re.compile(pattern, re.IGNORECASE)
+        else:
+            self.regex = None
+
+
+    @staticmethod
+    def anchor(term):
+        """Escape a term, refusing word characters right before or after it where it starts or ends with one"""
+
+        start = r'(?<!\w)' if re.match(r'\w', term) else ''
+        end = r'(?!\w)' if re.search(r'\w$', term) else ''
+        return f'{start}{re.escape(term)}{end}'
+
+
+    def __bool__(self):
+        return self.regex is not None
+
+
+    def search(self, text):
+        """Return True if any term appears in the text"""
+
+        return bool(self.regex and self.regex.search(text))
+
+
+    def findall(self, text):
+        """Return the set of terms that appear in the text"""
+
+        if not self.regex:
+            return set()
+        return {m.group(0).lower() for m in self.regex.finditer(text)}
@@ -1,19 +1,29 @@
 #!/usr/bin/env python3
 
-import json
 import webbrowser
-from pathlib import Path
+from export_store import ExportStore
+from export_stream import latest_export, read_export
 
-# get latest json export
-latest_export = max(Path('exports').glob('urls_*.json'))
+# firefox on macOS
+browser = "open -a /Applications/Firefox.app %s"
 
-# read json export
-with open(latest_export, 'r') as f:
-    urls = json.load(f)
 
-# open new browser window with blank tab
-browser = "open -a /Applications/Firefox.app %s"
-webbrowser.get(browser).open('about:blank', new=1)
+def main(export=None):
+    """Open listings new since the last run, or an export's if there are none, in the browser"""
+
+    urls = []
+    if export is None:
+        with ExportStore() as store:
+            urls = [row['url'] for row in store.new_since_last_run()]
+    if not urls:
+        urls = [record['url'] for record in read_export(export or latest_export())]
+
+    # open new browser window with blank tab
+    webbrowser.get(browser).open('about:blank', new=1)
+
+    # open urls in browser
+    [webbrowser.open(url) for url in urls]
+
 
-# open urls in browser
-[webbrowser.open(url) for url in urls]
+if __name__ == "__main__":
+    main()
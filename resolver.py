@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decouple import config
+from requests.adapters import HTTPAdapter
+from throttle import classify, limiter, retry_after
+from timing import span, timed
+
+# env vars
+max_workers = config('RESOLVE_WORKERS', default=8, cast=int)
+resolve_timeout = config('RESOLVE_TIMEOUT', default=10, cast=int)
+
+# because we got a 403 error when opening this normally, we have to establish the user agent
+user_agent = 'Mozilla/5.0 (Windows; U; Windows NT 5.1; en-US; rv:1.9.0.7) Gecko/2009021910 Firefox/3.0.7'
+
+# one session per worker thread so keep-alive connections are reused between lookups
+_local = threading.local()
+
+
+def get_session():
+    """Return the keep-alive session for the current thread"""
+
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'User-Agent': user_agent})
+        _local.session = session
+    return session
+
+
+@timed('resolve.redirects')
+def resolve(link, timeout=resolve_timeout):
+    """Follow the redirect chain of a link without downloading the body"""
+
+    session = get_session()
+
+    response = session.head(link, allow_redirects=True, timeout=timeout)
+    if response.ok:
+        return response.url
+
+    # some ATS hosts reject HEAD, so fall back to a streamed GET and drop the body
+    with session.get(link, allow_redirects=True, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        return response.url
+
+
+def _resolve_or_none(link):
+    """Resolve a link through the shared limiter, retrying throttled and failed attempts"""
+
+    attempt = 0
+    while True:
+        with span('resolve.throttle_wait'):
+            limiter.acquire_sync(link)
+        final, outcome, wait = None, 'error', None
+        try:
+            final, outcome = resolve(link), 'ok'
+        except requests.TooManyRedirects:
+            outcome = 'redirect_loop'
+        except requests.HTTPError as e:
+            outcome, wait = classify(e.response.status_code), retry_after(e.response.headers)
+        except requests.RequestException:
+            pass
+        finally:
+            limiter.release(link, outcome, wait)
+
+        if not limiter.should_retry(outcome, attempt):
+            return final
+        limiter.count_retry(link)
+        time.sleep(limiter.backoff(attempt, wait))
+        attempt += 1
+
+
+def resolve_urls(links, workers=max_workers):
+    """Resolve a batch of links concurrently, yielding (link, final url) pairs
+
+    The final url is None when the redirect chain could not be followed.
+    """
+
+    links = list(links)
+    if not links:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(links))) as pool:
+        yield from zip(links, pool.map(_resolve_or_none, links))
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+from decouple import config
+from playwright.async_api import Error
+from throttle import classify, limiter, retry_after
+from timing import span
+
+# env vars
+search_mode = config('SEARCH_MODE', default='dom')                  # api: read results from the search page's graphql responses
+api_timeout = config('SEARCH_API_TIMEOUT', default=15, cast=int) * 1000
+
+# the search page loads its results from glassdoor's graphql endpoint with this operation
+search_operation = config('SEARCH_API_OPERATION', default='JobSearchResultsQuery')
+
+# request headers the browser sets itself
+skip_headers = {'content-length', 'cookie', 'host', 'origin', 'referer'}
+
+# post the search query from inside the page, so it carries the session's cookies and routes
+fetch_script = """
+async ({url, body, headers}) => {
+    const response = await fetch(url, {method: 'POST', body, headers, credentials: 'include'});
+    return {
+        status: response.status,
+        retryAfter: response.headers.get('retry-after'),
+        payload: response.ok ? await response.json() : null,
+    };
+}
+"""
+
+
+def is_search_response(response):
+    """Return True for the graphql response carrying a page of search results"""
+
+    request = response.request
+    if request.method != 'POST' or '/graph' not in response.url:
+        return False
+    return search_operation in (request.post_data or '')
+
+
+def operations(payload):
+    """Glassdoor batches graphql operations, so a body is either one operation or a list of them"""
+
+    return payload if isinstance(payload, list) else [payload]
+
+
+def find_results(payload):
+    """Return the jobListings object of a search response, or None"""
+
+    for item in operations(payload):
+        results = ((item or {}).get('data') or {}).get('jobListings')
+        if results:
+            return results
+    return None
+
+
+def parse_salary(header):
+    pay = header.get('payPeriodAdjustedPay') or {}
+    if not pay:
+        return None
+    return {
+        "min": pay.get('p10'),
+        "median": pay.get('p50'),
+        "max": pay.get('p90'),
+        "currency": header.get('payCurrency'),
+        "period": header.get('payPeriod'),
+    }
+
+
+def parse_listing(item):
+    """Turn one jobListings entry into the shape of a scraped link, plus the fields only the api has"""
+
+    view = item.get('jobview') or {}
+    header = view.get('header') or {}
+    job = view.get('job') or {}
+    employer = header.get('employer') or {}
+    job_id = job.get('listingId') or header.get('jobListingId')
+    return {
+        "href": header.get('jobLink') or header.get('seoJobLink'),
+        "listing_id": str(job_id) if job_id else None,
+        "title": job.get('jobTitleText') or header.get('jobTitleText'),
+        "company": header.get('employerNameFromSearch') or employer.get('name'),
+        "salary": parse_salary(header),
+        "easy_apply": header.get('easyApply'),
+    }
+
+
+def parse_results(results):
+    """Return the listings in a jobListings object"""
+
+    listings = (parse_listing(item) for item in results.get('jobListings') or [])
+    return [listing for listing in listings if listing['href']]
+
+
+def next_cursor(results, page_num):
+    """Return the cursor for the page after `page_num`, or None on the last page"""
+
+    for cursor in results.get('paginationCursors') or []:
+        if cursor.get('pageNumber') == page_num + 1:
+            return cursor.get('cursor')
+    return None
+
+
+def page_body(body, cursor, page_num):
+    """Rewrite a captured search request body to ask for another page"""
+
+    payload = json.loads(body)
+    for item in operations(payload):
+        if item.get('operationName', search_operation) == search_operation:
+            variables = item.setdefault('variables', {})
+            variables['pageCursor'] = cursor
+            variables['pageNumber'] = page_num
+    return json.dumps(payload)
+
+
+class SearchApi:
+    """Page through search results by replaying the search page's own graphql request
+
+    The first response is captured while the search page loads; later pages post the
+    same query with the next pagination cursor from inside the page, so nothing is
+    rendered and the session, blocker and HAR routes still apply. Each page is marked
+    as a step of the HarSession, like the rendered results pages are.
+    """
+
+    def __init__(self, page, response, har):
+        self.page = page
+        self.url = response.url
+        self.body = response.request.post_data
+        self.response = response
+        self.har = har
+        self.headers = None
+        self.results = None
+
+
+    async def first(self):
+        """Read the captured response, returning its jobListings or None if it can't be read"""
+
+        try:
+            self.headers = {
+                key: value for key, value in (await self.response.request.all_headers()).items()
+                if not key.startswith(':') and key not in skip_headers
+            }
+            with span('scrape.api_parse'):
+                self.results = find_results(await self.response.json())
+        except (Error, ValueError) as e:
+            print(f"ERROR: search api response unreadable ({e})")
+            self.results = None
+        return self.results
+
+
+    async def fetch(self, cursor, page_num):
+        """Post the search query for `page_num`, through the shared limiter"""
+
+        body = page_body(self.body, cursor, page_num)
+        attempt = 0
+        while True:
+            await limiter.acquire(self.url)
+            outcome, wait, result = 'error', None, None
+            try:
+                with span('scrape.api_page'):
+                    result = await self.page.evaluate(
+                        fetch_script, {"url": self.url, "body": body, "headers": self.headers}
+                    )
+                outcome = classify(result['status'])
+                wait = retry_after({'retry-after': result['retryAfter']})
+            except Error:
+                pass
+            finally:
+                limiter.release(self.url, outcome, wait)
+
+            if outcome == 'ok':
+                return find_results(result['payload'])
+            if not limiter.should_retry(outcome, attempt):
+                print(f"ERROR: search api failed for page {page_num} ({outcome})")
+                return None
+            limiter.count_retry(self.url)
+            await asyncio.sleep(limiter.backoff(attempt, wait))
+            attempt += 1
+
+
+    async def pages(self):
+        """Yield the listings on each results page, following the pagination cursors"""
+
+        results = self.results if self.results is not None else await self.first()
+        page_num = 1
+        while results:
+            await self.har.step(self.page, f'results-{page_num}')
+            yield parse_results(results)
+
+            cursor = next_cursor(results, page_num)
+            if cursor is None:
+                break
+            page_num += 1
+            results = await self.fetch(cursor, page_num)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import as_completed, ProcessPoolExecutor
+from decouple import config, Csv
+from itertools import product
+
+# env vars (semicolon-separated, since locations like "San Francisco, CA" have commas)
+shard_titles = config('SHARD_TITLES', default='', cast=Csv(delimiter=';'))
+shard_locations = config('SHARD_LOCATIONS', default='', cast=Csv(delimiter=';'))
+shard_workers = config('SHARD_WORKERS', default=os.cpu_count() or 1, cast=int)
+
+
+def query_matrix(titles, locations):
+    """Every (position title, location) pair to search for"""
+
+    return list(product(dict.fromkeys(titles), dict.fromkeys(locations)))
+
+
+def scrape_query(query):
+    """Scrape one search in this worker process, with its own browser, and return its listings"""
+
+    import asyncio
+    import get_links_pw
+
+    # every worker starts from the saved session; none of them write it back
+    listings = asyncio.run(
+        get_links_pw.main(get_links_pw.url, action='get_listings', query=query, save_state=False)
+    )
+    return [{**listing, "query": ' | '.join(query)} for listing in listings or []]
+
+
+def scrape_all(queries, workers=shard_workers):
+    """Scrape a matrix of searches over a process pool and merge them into one deduplicated export"""
+
+    from browser_pool import state
+    from export_store import ExportStore
+    from export_stream import ExportWriter
+
+    if not queries:
+        print("No queries to scrape (set SHARD_TITLES and SHARD_LOCATIONS).")
+        return None
+    if not state.is_file():
+        print(f"No saved session at {state}, so every worker will scrape logged out.")
+
+    workers = max(1, min(workers, len(queries)))
+    timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+    fn = f"exports/urls_{timestamp}.jsonl"
+    print(f"Scraping {len(queries)} searches on {workers} processes into {fn}...")
+
+    # the same listing shows up under several searches with a different `pos` in its url,
+    # the export writer drops the repeats by listing ID
+    new = 0
+
+    # spawn, not fork: each worker starts its own playwright driver and event loop
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool, \
+            ExportWriter(fn) as export, ExportStore() as store:
+        store.start_run()
+        futures = {pool.submit(scrape_query, query): query for query in queries}
+        for future in as_completed(futures):
+            title, where = futures[future]
+            try:
+                listings = future.result()
+            except Exception as e:
+                print(f"FAILED FOR {title} in {where}: {e}")
+                continue
+
+            added = 0
+            for listing in listings:
+                if export.write(listing):
+                    added += 1
+                    new += store.add(listing)
+            print(f"{title} in {where}: {len(listings)} listings, {added} not seen in other searches")
+        store.finish_run()
+
+    print(f"Exported {export.count} URLs ({new} new) to {fn}")
+    return fn
+
+
+if __name__ == "__main__":
+    scrape_all(query_matrix(shard_titles, shard_locations))
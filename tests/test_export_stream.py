@@ -0,0 +1,69 @@
+import asyncio
+import json
+from export_stream import ats, ExportWriter, follow_export, read_export
+
+
+def listing(n, pos=1):
+    return {"url": f"https://www.glassdoor.com/partner/jobListing.htm?pos={pos}&jobListingId={n}", "listing_id": str(n)}
+
+
+def test_writer_dedupes_on_listing_id(tmp_path):
+    path = tmp_path / "urls.jsonl"
+
+    with ExportWriter(path) as export:
+        assert export.write(listing(1))
+        assert not export.write(listing(1, pos=9))
+        assert export.write(listing(2))
+
+    assert [record["listing_id"] for record in read_export(path)] == ["1", "2"]
+    assert "end" in json.loads(path.read_text().splitlines()[-1])
+
+
+def test_follow_waits_for_split_lines_and_stops_at_the_end_marker(tmp_path):
+    path = tmp_path / "urls.jsonl"
+    path.touch()
+
+    async def write():
+        with open(path, 'a') as f:
+            line = json.dumps(listing(1)) + '\n'
+            f.write(line[:20])
+            f.flush()
+            await asyncio.sleep(0.05)
+            f.write(line[20:])
+            f.write(json.dumps(listing(2)) + '\n')
+            f.write(json.dumps({"end": "2026-10-18 12:00:00"}) + '\n')
+
+    async def follow():
+        writer = asyncio.create_task(write())
+        records = [record async for record in follow_export(path, poll=0.01, idle=5)]
+        await writer
+        return records
+
+    records = asyncio.run(asyncio.wait_for(follow(), timeout=5))
+
+    assert [record["listing_id"] for record in records] == ["1", "2"]
+
+
+def test_follow_gives_up_when_nothing_is_appended(tmp_path):
+    path = tmp_path / "urls.jsonl"
+    path.write_text(json.dumps(listing(1)) + '\n')
+
+    async def follow():
+        return [record async for record in follow_export(path, poll=0.01, idle=0.05)]
+
+    assert len(asyncio.run(asyncio.wait_for(follow(), timeout=5))) == 1
+
+
+def test_read_old_json_exports(tmp_path):
+    path = tmp_path / "urls.json"
+    path.write_text(json.dumps(["https://jobs.lever.co/acme/1"]))
+
+    assert list(read_export(path)) == [{"url": "https://jobs.lever.co/acme/1"}]
+
+
+def test_ats_matches_whole_domains():
+    assert ats("https://boards.greenhouse.io/acme/jobs/1") == 'greenhouse'
+    assert ats("https://jobs.lever.co/acme/1") == 'lever'
+    assert ats("https://www.glassdoor.com/job-listing/x") == 'easy_apply'
+    assert ats("https://cleverco.com/jobs") is None
+    assert ats("https://greenhouse.io.example.com/") is None
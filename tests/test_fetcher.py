@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+import throttle
+from fetcher import fetch_all
+from playwright.async_api import Error
+from throttle import AdaptiveLimiter
+
+
+class Response:
+    def __init__(self, status, body='', headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+    async def text(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+class Request:
+    """Stands in for page.context.request, answering each url from a script of responses"""
+
+    def __init__(self, script):
+        self.script = {url: list(responses) for url, responses in script.items()}
+        self.calls = []
+
+
+    async def get(self, url, headers=None):
+        self.calls.append(url)
+        response = self.script[url].pop(0) if len(self.script[url]) > 1 else self.script[url][0]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(throttle, 'retry_base', 0.0)
+
+
+def fetch(request, urls, retries=2):
+    async def run():
+        limiter = AdaptiveLimiter(rate=0, retries=retries)
+        return [item async for item in fetch_all(request, urls, concurrency=2, limiter=limiter)], limiter
+
+    # a url that never yields hangs fetch_all, so fail instead of waiting on it
+    return asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+
+def test_throttled_then_ok():
+    request = Request({"https://a.test/1": [Response(429, headers={'retry-after': '0'}), Response(200, 'hello')]})
+
+    results, limiter = fetch(request, ["https://a.test/1"])
+
+    assert results == [("https://a.test/1", 'hello')]
+    assert len(request.calls) == 2
+    assert limiter.counters['*'] == {'throttled': 1, 'ok': 1, 'retried': 1}
+
+
+def test_redirect_loop_gives_up():
+    request = Request({"https://a.test/1": [Error("net::ERR_TOO_MANY_REDIRECTS")]})
+
+    results, limiter = fetch(request, ["https://a.test/1"], retries=2)
+
+    assert results == [("https://a.test/1", None)]
+    assert len(request.calls) == 3
+    assert limiter.counters['*']['redirect_loop'] == 3
+
+
+def test_client_errors_are_not_retried():
+    request = Request({"https://a.test/1": [Response(404)]})
+
+    results, _ = fetch(request, ["https://a.test/1"])
+
+    assert results == [("https://a.test/1", None)]
+    assert len(request.calls) == 1
+
+
+def test_unexpected_errors_fail_the_url_not_the_fetch():
+    script = {
+        "https://a.test/ok": [Response(200, 'fine')],
+        "https://a.test/decode": [Response(200, UnicodeDecodeError('utf-8', b'\xff', 0, 1, 'invalid start byte'))],
+        "https://a.test/bug": [RuntimeError("boom")],
+    }
+
+    results, _ = fetch(Request(script), list(script) * 3)
+
+    # every url yields exactly once per time it was fed, failed or not
+    assert sorted(url for url, _ in results) == sorted(list(script) * 3)
+    assert {url: html for url, html in results} == {
+        "https://a.test/ok": 'fine', "https://a.test/decode": None, "https://a.test/bug": None,
+    }
+
+
+def test_async_iterable_of_urls():
+    urls = [f"https://a.test/{i}" for i in range(10)]
+    request = Request({url: [Response(200, url)] for url in urls})
+
+    async def feed():
+        for url in urls:
+            await asyncio.sleep(0)
+            yield url
+
+    results, _ = fetch(request, feed())
+
+    assert sorted(results) == sorted((url, url) for url in urls)
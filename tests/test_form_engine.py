@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from form_engine import Field, fill_form
+from playwright.async_api import async_playwright, Error
+
+step = """
+<form>
+  <label for="email">Email</label><input id="email" name="email">
+  <button type="button" onclick="document.body.dataset.clicks = (+document.body.dataset.clicks || 0) + 1">Continue</button>
+</form>
+"""
+
+
+def run(steps, fields):
+    """Fill each step in turn on one page, swapping the form in place like a single-page app"""
+
+    async def main():
+        async with async_playwright() as playwright:
+            try:
+                browser = await playwright.chromium.launch()
+            except Error as e:
+                pytest.skip(f"chromium isn't available ({e})")
+            page = await browser.new_page()
+            await page.set_content("<body></body>")
+            reports = []
+            for html in steps:
+                # the previous step stays in the DOM, hidden, as it does on Indeed
+                await page.evaluate("""html => {
+                    document.querySelectorAll('form').forEach(form => form.hidden = true);
+                    document.body.insertAdjacentHTML('beforeend', html);
+                }""", html)
+                reports.append(await fill_form(page, fields))
+            values = await page.eval_on_selector_all("input[name=email]", "els => els.map(el => el.value)")
+            clicks = await page.evaluate("document.body.dataset.clicks")
+            await browser.close()
+            return reports, values, clicks
+
+    return asyncio.run(main())
+
+
+def test_tags_from_an_earlier_step_are_cleared():
+    fields = [Field("email", "name", "email", "fill", "test@test.com"), Field("continue", "button", "Continue", "click")]
+
+    reports, values, clicks = run([step, step], fields)
+
+    assert reports == [{"email": True, "continue": True}] * 2
+    assert values == ["test@test.com", "test@test.com"]
+    assert clicks == "2"
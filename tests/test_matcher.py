@@ -0,0 +1,41 @@
+from matcher import TermMatcher
+
+
+def test_whole_words_only():
+    matcher = TermMatcher(['java'])
+
+    assert matcher.search("Java developer")
+    assert not matcher.search("JavaScript developer")
+
+
+def test_leading_punctuation():
+    matcher = TermMatcher(['.net'])
+
+    assert matcher.search("ASP.NET Core")
+    assert matcher.search(".NET developer")
+    assert not matcher.search("ASP.NETwork")
+
+
+def test_trailing_punctuation():
+    matcher = TermMatcher(['c++', 'c#'])
+
+    assert matcher.findall("C++ and C# developer") == {'c++', 'c#'}
+    assert matcher.findall("Modern C++17, C#10") == {'c++', 'c#'}
+    assert not matcher.search("ObjC++")
+    assert not matcher.search("C, C-sharp")
+
+
+def test_inner_punctuation():
+    matcher = TermMatcher(['node.js'])
+
+    assert matcher.search("Experience with Node.js required")
+    assert not matcher.search("node.json")
+    assert not matcher.search("nodeXjs")
+
+
+def test_empty_terms():
+    matcher = TermMatcher(['', '  '])
+
+    assert not matcher
+    assert not matcher.search("anything")
+    assert matcher.findall("anything") == set()
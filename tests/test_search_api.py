@@ -0,0 +1,82 @@
+import json
+from search_api import find_results, next_cursor, page_body, parse_listing, parse_results
+
+# trimmed from a JobSearchResultsQuery response
+listing = {
+    "jobview": {
+        "header": {
+            "jobLink": "/partner/jobListing.htm?pos=101&ao=1136043&jobListingId=1008587573785",
+            "jobListingId": 1008587573785,
+            "employerNameFromSearch": "Acme",
+            "employer": {"id": 42, "name": "Acme Corp"},
+            "easyApply": True,
+            "payCurrency": "USD",
+            "payPeriod": "ANNUAL",
+            "payPeriodAdjustedPay": {"p10": 120000, "p50": 145000, "p90": 170000},
+        },
+        "job": {"listingId": 1008587573785, "jobTitleText": "Python Developer"},
+    }
+}
+
+results = {
+    "jobListings": [listing, {"jobview": {"header": {}, "job": {}}}],
+    "paginationCursors": [{"cursor": "AB4AAYEAHgAA", "pageNumber": 2}, {"cursor": "AB4AAoEAPAAA", "pageNumber": 3}],
+}
+
+
+def test_parse_listing():
+    assert parse_listing(listing) == {
+        "href": "/partner/jobListing.htm?pos=101&ao=1136043&jobListingId=1008587573785",
+        "listing_id": "1008587573785",
+        "title": "Python Developer",
+        "company": "Acme",
+        "salary": {"min": 120000, "median": 145000, "max": 170000, "currency": "USD", "period": "ANNUAL"},
+        "easy_apply": True,
+    }
+
+
+def test_parse_listing_with_missing_fields():
+    header = {"seoJobLink": "/job-listing/x.htm?jl=7", "employer": {"name": "Globex"}}
+
+    parsed = parse_listing({"jobview": {"header": header}})
+
+    assert parsed["href"] == "/job-listing/x.htm?jl=7"
+    assert parsed["company"] == "Globex"
+    assert parsed["listing_id"] is None
+    assert parsed["salary"] is None
+
+
+def test_parse_results_drops_listings_without_a_link():
+    assert [item["listing_id"] for item in parse_results(results)] == ["1008587573785"]
+
+
+def test_find_results_in_batched_operations():
+    batch = [{"data": {"employerReviews": {}}}, {"data": {"jobListings": results}}]
+
+    assert find_results(batch) is results
+    assert find_results({"data": {"jobListings": results}}) is results
+    assert find_results([{"errors": [{"message": "nope"}]}, None]) is None
+
+
+def test_next_cursor():
+    assert next_cursor(results, 1) == "AB4AAYEAHgAA"
+    assert next_cursor(results, 2) == "AB4AAoEAPAAA"
+    assert next_cursor(results, 3) is None
+
+
+def test_page_body_rewrites_only_the_search_operation():
+    body = json.dumps([
+        {"operationName": "JobSearchResultsQuery", "variables": {"keyword": "python", "pageNumber": 1}},
+        {"operationName": "RecordPageView", "variables": {"pageNumber": 1}},
+    ])
+
+    search, other = json.loads(page_body(body, "AB4AAYEAHgAA", 2))
+
+    assert search["variables"] == {"keyword": "python", "pageNumber": 2, "pageCursor": "AB4AAYEAHgAA"}
+    assert other["variables"] == {"pageNumber": 1}
+
+
+def test_page_body_for_a_single_operation():
+    body = json.dumps({"query": "query JobSearchResultsQuery { ... }"})
+
+    assert json.loads(page_body(body, "c", 3))["variables"] == {"pageCursor": "c", "pageNumber": 3}
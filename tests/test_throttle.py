@@ -0,0 +1,105 @@
+import pytest
+import throttle
+from throttle import AdaptiveLimiter, classify, Host, poll_interval, retry_after
+
+url = "https://www.glassdoor.com/job-listing/x"
+
+
+def test_throttled_halves_the_limit_and_cools_down():
+    limiter = AdaptiveLimiter(rate=0, ceiling=8)
+    limiter._reserve(url)
+
+    limiter.release(url, 'throttled', retry_after=5)
+
+    host = limiter.hosts['www.glassdoor.com']
+    assert host.limit == 4
+    assert 4.5 < limiter._reserve(url) <= 5
+
+
+def test_successes_grow_the_limit_back_one_at_a_time():
+    limiter = AdaptiveLimiter(rate=0, ceiling=8)
+    limiter.release(url, 'redirect_loop', retry_after=0)
+    host = limiter.hosts['www.glassdoor.com']
+    assert host.limit == 4
+
+    for _ in range(4):
+        limiter.release(url, 'ok')
+
+    assert host.limit == pytest.approx(5, abs=0.1)
+    for _ in range(100):
+        limiter.release(url, 'ok')
+    assert host.limit == 8
+
+
+def test_limit_never_drops_below_one():
+    limiter = AdaptiveLimiter(rate=0, ceiling=2)
+    for _ in range(5):
+        limiter.release(url, 'throttled', retry_after=0)
+
+    assert limiter.hosts['www.glassdoor.com'].limit == 1
+
+
+def test_host_waits_at_its_concurrency_limit():
+    host = Host(rate=0, burst=1, ceiling=1)
+
+    assert host.reserve(0) == 0
+    assert host.reserve(0) == poll_interval
+    host.active -= 1
+    assert host.reserve(0) == 0
+
+
+def test_token_bucket_paces_requests():
+    host = Host(rate=2, burst=1, ceiling=8)
+    now = host.updated
+
+    assert host.reserve(now) == 0
+    assert host.reserve(now) == pytest.approx(0.5)
+    assert host.reserve(now + 0.5) == 0
+
+
+def test_retry_budget():
+    limiter = AdaptiveLimiter(retries=2)
+
+    assert limiter.should_retry('throttled', 0)
+    assert limiter.should_retry('error', 1)
+    assert not limiter.should_retry('server_error', 2)
+    assert not limiter.should_retry('failed', 0)
+    assert not limiter.should_retry('ok', 0)
+
+
+def test_backoff(monkeypatch):
+    monkeypatch.setattr(throttle, 'retry_base', 2.0)
+    monkeypatch.setattr(throttle, 'retry_cap', 60.0)
+    limiter = AdaptiveLimiter()
+
+    assert limiter.backoff(3, retry_after=7) == 7
+    assert 1 <= limiter.backoff(0) <= 3
+    assert 30 <= limiter.backoff(10) <= 90
+
+
+def test_outcomes_are_counted_per_host():
+    limiter = AdaptiveLimiter(rate=0)
+    limiter.release(url, 'ok')
+    limiter.release("https://boards.greenhouse.io/x", 'failed')
+    limiter.count_retry(url)
+
+    assert limiter.counters['www.glassdoor.com'] == {'ok': 1, 'retried': 1}
+    assert limiter.counters['*'] == {'ok': 1, 'failed': 1, 'retried': 1}
+
+
+def test_classify():
+    assert classify(200) == 'ok'
+    assert classify(302) == 'ok'
+    assert classify(429) == 'throttled'
+    assert classify(403) == 'throttled'
+    assert classify(404) == 'failed'
+    assert classify(503) == 'server_error'
+
+
+def test_retry_after():
+    assert retry_after({'retry-after': '3'}) == 3
+    assert retry_after({'Retry-After': '1.5'}) == 1.5
+    assert retry_after({'retry-after': '100000'}) == throttle.retry_cap
+    # http dates aren't supported, so fall back to the backoff
+    assert retry_after({'retry-after': 'Wed, 21 Oct 2026 07:28:00 GMT'}) is None
+    assert retry_after(None) is None
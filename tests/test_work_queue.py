@@ -0,0 +1,122 @@
+import asyncio
+import time
+from work_queue import keep_lease, WorkQueue
+
+
+def record(n):
+    return {"url": f"https://www.glassdoor.com/partner/jobListing.htm?pos={n}&jobListingId={1000 + n}", "title": f"Job {n}"}
+
+
+def open_queue(tmp_path, **kwargs):
+    return WorkQueue(path=str(tmp_path / 'queue.sqlite'), **kwargs)
+
+
+def test_publish_dedupes_on_listing_id(tmp_path):
+    with open_queue(tmp_path) as queue:
+        assert queue.publish([record(1), record(2)]) == 2
+        moved = {**record(1), "url": record(1)["url"].replace("pos=1", "pos=7")}
+        assert queue.publish([moved]) == 0
+        assert queue.pending() == 2
+
+
+def test_claim_leases_each_job_once(tmp_path):
+    with open_queue(tmp_path) as queue:
+        queue.publish([record(1), record(2)])
+
+        first = queue.claim('a')
+        second = queue.claim('b')
+
+        assert first['key'] == '1001' and first['title'] == 'Job 1' and first['attempts'] == 1
+        assert second['key'] == '1002'
+        assert queue.claim('c') is None
+        assert queue.stats() == {'leased': 2}
+
+
+def test_expired_lease_is_redelivered(tmp_path):
+    with open_queue(tmp_path, lease=0.05) as queue:
+        queue.publish([record(1)])
+        queue.claim('a')
+        assert queue.claim('b') is None
+
+        time.sleep(0.1)
+        job = queue.claim('b')
+
+        assert job['key'] == '1001' and job['attempts'] == 2
+        # the first worker's lease is gone
+        assert not queue.renew('1001', 'a')
+        assert queue.renew('1001', 'b')
+
+
+def test_expired_lease_on_last_attempt_is_dead(tmp_path):
+    with open_queue(tmp_path, lease=0.05, attempts=1) as queue:
+        queue.publish([record(1)])
+        queue.claim('a')
+
+        time.sleep(0.1)
+
+        assert queue.claim('b') is None
+        assert queue.stats() == {'dead': 1}
+
+
+def test_fail_retries_then_goes_dead(tmp_path):
+    with open_queue(tmp_path, attempts=2) as queue:
+        queue.publish([record(1)])
+
+        queue.fail(queue.claim('a')['key'], 'a', 'timeout')
+        assert queue.stats() == {'ready': 1}
+
+        queue.fail(queue.claim('a')['key'], 'a', 'timeout')
+        assert queue.stats() == {'dead': 1}
+
+        assert queue.retry_dead() == 1
+        assert queue.claim('a')['attempts'] == 1
+
+
+def test_fail_without_retry_is_dead(tmp_path):
+    with open_queue(tmp_path) as queue:
+        queue.publish([record(1)])
+
+        queue.fail(queue.claim('a')['key'], 'a', 'filled', retry=False)
+
+        assert queue.stats() == {'dead': 1}
+
+
+def test_fail_after_losing_the_lease_is_ignored(tmp_path):
+    with open_queue(tmp_path, lease=0.05) as queue:
+        queue.publish([record(1)])
+        queue.claim('a')
+        time.sleep(0.1)
+        queue.claim('b')
+
+        queue.fail('1001', 'a', 'timeout', retry=False)
+
+        assert queue.stats() == {'leased': 1}
+
+
+def test_ack_marks_done(tmp_path):
+    with open_queue(tmp_path) as queue:
+        queue.publish([record(1)])
+
+        queue.ack(queue.claim('a')['key'], 'a')
+
+        assert queue.stats() == {'done': 1}
+        assert queue.pending() == 0
+
+
+def test_keep_lease_renews_off_the_event_loop(tmp_path):
+    with open_queue(tmp_path, lease=0.3) as queue:
+        queue.publish([record(1)])
+
+        async def run():
+            job = await queue.call(queue.claim, 'a')
+            keeper = asyncio.create_task(keep_lease(queue, job, 'a'))
+            await asyncio.sleep(0.5)
+            keeper.cancel()
+            return job
+
+        job = asyncio.run(run())
+
+        # renewed past the original lease, so nobody else can claim it
+        assert queue.claim('b') is None
+        assert queue.leases()[0]['lease_until'] > time.time()
+        assert job['key'] == '1001'
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import asyncio
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from decouple import config
+from urllib.parse import urlparse
+
+# env vars
+host_rate = config('FETCH_RATE', default=2.0, cast=float)             # requests per second, per host
+host_burst = config('FETCH_BURST', default=4, cast=int)               # requests a quiet host may send at once
+host_concurrency = config('HOST_CONCURRENCY', default=8, cast=int)    # ceiling for the adaptive per-host limit
+max_retries = config('FETCH_RETRIES', default=3, cast=int)
+retry_base = config('RETRY_BASE', default=2.0, cast=float)            # seconds, doubled per attempt
+retry_cap = config('RETRY_CAP', default=60.0, cast=float)
+
+# responses that mean we're going too fast for the host
+throttled_statuses = {403, 429}
+
+# how often a caller re-checks a host that's at its concurrency limit
+poll_interval = 0.05
+
+
+class Host:
+    """Token bucket, adaptive concurrency limit and cooldown for a single host"""
+
+    def __init__(self, rate, burst, ceiling):
+        self.rate = rate
+        self.burst = burst
+        self.ceiling = ceiling
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.limit = float(ceiling)
+        self.active = 0
+        self.cooldown_until = 0.0
+
+
+    def reserve(self, now):
+        """Take a slot and a token, or return how long to wait before trying again"""
+
+        if now < self.cooldown_until:
+            return self.cooldown_until - now
+
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.active >= int(self.limit):
+            return poll_interval
+        if self.rate > 0 and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+
+        if self.rate > 0:
+            self.tokens -= 1
+        self.active += 1
+        return 0
+
+
+class AdaptiveLimiter:
+    """Shared scheduler for outbound fetches, with one token bucket per host
+
+    Each host's concurrency limit is AIMD: it grows by one per `limit` successes and
+    halves on a 403/429 or a redirect loop, which also pauses the host for the
+    Retry-After or backoff delay. Outcomes are counted per host and overall.
+    Works from both asyncio tasks (`acquire`) and threads (`acquire_sync`).
+    """
+
+    def __init__(self, rate=host_rate, burst=host_burst, ceiling=host_concurrency, retries=max_retries):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.ceiling = max(1, ceiling)
+        self.retries = retries
+        self.hosts = {}
+        self.counters = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+
+    def _host(self, url):
+        name = urlparse(url).netloc
+        if name not in self.hosts:
+            self.hosts[name] = Host(self.rate, self.burst, self.ceiling)
+        return self.hosts[name]
+
+
+    def _reserve(self, url):
+        with self._lock:
+            return self._host(url).reserve(time.monotonic())
+
+
+    async def acquire(self, url):
+        """Wait for a slot and a token for the url's host"""
+
+        while (delay := self._reserve(url)) > 0:
+            await asyncio.sleep(delay)
+
+
+    def acquire_sync(self, url):
+        while (delay := self._reserve(url)) > 0:
+            time.sleep(delay)
+
+
+    def release(self, url, outcome, retry_after=None):
+        """Free the url's slot and adapt the host's limit to how the request went
+
+        outcome is one of 'ok', 'throttled', 'redirect_loop', 'server_error', 'error' or 'failed'.
+        """
+
+        host_name = urlparse(url).netloc
+        with self._lock:
+            host = self._host(url)
+            host.active = max(0, host.active - 1)
+            self.counters[host_name][outcome] += 1
+            self.counters['*'][outcome] += 1
+
+            if outcome == 'ok':
+                # additive increase: +1 once `limit` requests in a row have succeeded
+                host.limit = min(self.ceiling, host.limit + 1 / host.limit)
+            elif outcome in ('throttled', 'redirect_loop'):
+                # multiplicative decrease, and let the host cool down before the next request
+                host.limit = max(1.0, host.limit / 2)
+                host.tokens = 0
+                pause = retry_after if retry_after is not None else self.backoff(0)
+                host.cooldown_until = max(host.cooldown_until, time.monotonic() + pause)
+
+
+    def should_retry(self, outcome, attempt):
+        return outcome in ('throttled', 'redirect_loop', 'server_error', 'error') and attempt < self.retries
+
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt + 1`, jittered by ±50%"""
+
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0.5, 1.5) * min(retry_cap, retry_base * 2 ** attempt)
+
+
+    def count_retry(self, url):
+        with self._lock:
+            self.counters[urlparse(url).netloc]['retried'] += 1
+            self.counters['*']['retried'] += 1
+
+
+    def report(self):
+        """Summarize outcomes and the current limit for each host"""
+
+        lines = []
+        for name, counts in sorted(self.counters.items()):
+            if name == '*':
+                continue
+            host = self.hosts.get(name)
+            outcomes = ', '.join(f"{outcome}: {n}" for outcome, n in sorted(counts.items()))
+            lines.append(f"{name} ({outcomes}; limit {int(host.limit) if host else '-'})")
+        total = ', '.join(f"{outcome}: {n}" for outcome, n in sorted(self.counters['*'].items()))
+        return '\n'.join([f"Fetches ({total or 'none'})", *lines])
+
+
+def classify(status):
+    """Map an http status to a limiter outcome"""
+
+    if status in throttled_statuses:
+        return 'throttled'
+    if status >= 500:
+        return 'server_error'
+    if status >= 400:
+        return 'failed'
+    return 'ok'
+
+
+def retry_after(headers):
+    """Parse a Retry-After header given in seconds, or return None"""
+
+    value = (headers or {}).get('retry-after') or (headers or {}).get('Retry-After')
+    try:
+        return min(retry_cap, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+# one limiter per process, so every fetcher and resolver shares the same view of each host
+limiter = AdaptiveLimiter()
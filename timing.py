@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import atexit
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from decouple import config
+from pathlib import Path
+
+# env vars
+timing_toggle = config('TIMING', default=False, cast=bool)
+timing_dir = config('TIMING_DIR', default='exports')
+
+# disabled spans all share one no-op context, so they cost a function call
+_noop = nullcontext()
+
+samples = defaultdict(list)     # span name -> durations in seconds
+meta = {}                       # run settings worth seeing next to the timings (e.g. slow_mo)
+_lock = threading.Lock()
+
+
+class Span:
+    """Time a block and add its duration to the run's samples"""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            samples[self.name].append(elapsed)
+
+
+def span(name):
+    """Context manager timing a block as `name` when TIMING is on"""
+
+    return Span(name) if timing_toggle else _noop
+
+
+def timed(name):
+    """Decorator timing every call of a sync or async function as `name`
+
+    When TIMING is off the function is returned untouched.
+    """
+
+    def decorator(func):
+        if not timing_toggle:
+            return func
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with Span(name):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with Span(name):
+                    return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list"""
+
+    index = max(0, -(-pct * len(values) // 100) - 1)
+    return values[int(index)]
+
+
+def summary():
+    """Return {span name: count, total, p50, p95 and max in ms}, slowest total first"""
+
+    with _lock:
+        items = [(name, sorted(durations)) for name, durations in samples.items()]
+
+    stats = {}
+    for name, durations in sorted(items, key=lambda item: -sum(item[1])):
+        stats[name] = {
+            "count": len(durations),
+            "total_ms": round(sum(durations) * 1000, 1),
+            "p50_ms": round(percentile(durations, 50) * 1000, 1),
+            "p95_ms": round(percentile(durations, 95) * 1000, 1),
+            "max_ms": round(durations[-1] * 1000, 1),
+        }
+    return stats
+
+
+def write_report():
+    """Write the run's timings to <TIMING_DIR>/timing_<timestamp>.json and print a table"""
+
+    stats = summary()
+    if not stats:
+        return None
+
+    timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+    path = Path(timing_dir) / f"timing_{timestamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({"meta": meta, "spans": stats}, f, indent=2)
+
+    print(f"\n{'span':<28}{'count':>7}{'total':>11}{'p50':>9}{'p95':>9}{'max':>9}  (ms)")
+    for name, row in stats.items():
+        print(
+            f"{name:<28}{row['count']:>7}{row['total_ms']:>11.0f}"
+            f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['max_ms']:>9.0f}"
+        )
+    print(f"Timing report written to {path}")
+    return path
+
+
+# report whatever was recorded, even when the run dies part way
+if timing_toggle:
+    atexit.register(write_report)
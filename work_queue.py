@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from decouple import config
+from listing_cache import listing_key
+from pathlib import Path
+
+# env vars
+queue_path = config('QUEUE_PATH', default='exports/queue.sqlite')
+queue_journal = config('QUEUE_JOURNAL', default='WAL')          # DELETE when the queue is on a network share
+lease_seconds = config('QUEUE_LEASE', default=300, cast=float)  # visibility timeout for a claimed job
+max_attempts = config('QUEUE_MAX_ATTEMPTS', default=3, cast=int)
+poll_interval = config('QUEUE_POLL', default=2.0, cast=float)
+queue_workers = config('QUEUE_WORKERS', default=2, cast=int)
+
+# application outcomes worth another attempt (see apply_pw.apply)
+retry_statuses = {'failed', 'incomplete'}
+
+schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key          TEXT PRIMARY KEY,
+    url          TEXT NOT NULL,
+    record       TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'ready',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    worker       TEXT,
+    lease_until  REAL,
+    available_at REAL NOT NULL,
+    enqueued_at  REAL NOT NULL,
+    updated_at   REAL NOT NULL,
+    error        TEXT
+);
+
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (status, lease_until);
+"""
+
+class WorkQueue:
+    """Durable queue of listings to apply to, shared by every worker that can open the file
+
+    There's one job per listing (see listing_cache.listing_key), whatever URL it was
+    published with. A job is ready, leased, done or dead. Claiming a job leases it to one worker for
+    `lease` seconds; the worker renews the lease while the flow runs and acks it when
+    done. If a worker dies its lease runs out and the job is handed to the next claim,
+    until it has been tried `attempts` times. Leases use wall-clock time, so hosts
+    sharing the queue need their clocks in sync.
+    """
+
+    def __init__(self, path=queue_path, lease=lease_seconds, attempts=max_attempts):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lease = lease
+        self.attempts = attempts
+        # workers use it from threads, one at a time (see call); a busy database mustn't hold up
+        # a lease renewal until the lease runs out
+        self.conn = sqlite3.connect(path, timeout=min(60, lease / 6), check_same_thread=False)
+        self.lock = asyncio.Lock()
+        self.conn.row_factory = sqlite3.Row
+        # WAL needs shared memory, which network filesystems don't give us
+        self.conn.execute(f"PRAGMA journal_mode = {queue_journal}")
+        self.conn.executescript(schema)
+
+
+    async def call(self, method, *args, **kwargs):
+        """Run a queue method in a thread, so waiting on a busy database doesn't block the event loop"""
+
+        # the connection is shared, so only one thread uses it at a time
+        async with self.lock:
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+    def publish(self, records):
+        """Add export records as ready jobs, returning how many listings weren't queued before"""
+
+        now = time.time()
+        cursor = self.conn.executemany(
+            """
+            INSERT OR IGNORE INTO jobs (key, url, record, available_at, enqueued_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (listing_key(record['url'], record.get('listing_id')), record['url'], json.dumps(record), now, now, now)
+                for record in records
+            ],
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+
+    def claim(self, worker):
+        """Lease the oldest available job to `worker`, or return None if there isn't one"""
+
+        now = time.time()
+        with self.conn:
+            # jobs whose lease ran out on their last attempt aren't handed out again
+            self.conn.execute(
+                """
+                UPDATE jobs SET status = 'dead', error = 'lease expired', updated_at = ?
+                WHERE status = 'leased' AND lease_until < ? AND attempts >= ?
+                """,
+                (now, now, self.attempts),
+            )
+            # one statement, so two workers can never lease the same job
+            row = self.conn.execute(
+                """
+                UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ?
+                WHERE key = (
+                    SELECT key FROM jobs
+                    WHERE (status = 'ready' AND available_at <= ?) OR (status = 'leased' AND lease_until < ?)
+                    ORDER BY enqueued_at
+                    LIMIT 1
+                )
+                RETURNING key, record, attempts
+                """,
+                (worker, now + self.lease, now, now, now),
+            ).fetchone()
+
+        if row is None:
+            return None
+        return {**json.loads(row['record']), "key": row['key'], "attempts": row['attempts']}
+
+
+    def renew(self, key, worker):
+        """Extend `worker`'s lease on a job, returning False if the lease was lost"""
+
+        now = time.time()
+        cursor = self.conn.execute(
+            """
+            UPDATE jobs SET lease_until = ?, updated_at = ?
+            WHERE key = ? AND worker = ? AND status = 'leased'
+            """,
+            (now + self.lease, now, key, worker),
+        )
+        self.conn.commit()
+        return cursor.rowcount == 1
+
+
+    def ack(self, key, worker):
+        """Mark a job done (even if its lease ran out, since the application went through)"""
+
+        self.conn.execute(
+            """
+            UPDATE jobs SET status = 'done', worker = ?, lease_until = NULL, error = NULL, updated_at = ?
+            WHERE key = ?
+            """,
+            (worker, time.time(), key),
+        )
+        self.conn.commit()
+
+
+    def fail(self, key, worker, error, delay=0, retry=True):
+        """Put a failed job back after `delay` seconds, or mark it dead once it's out of attempts (or not worth retrying)"""
+
+        now = time.time()
+        self.conn.execute(
+            """
+            UPDATE jobs SET
+                status = CASE WHEN ? OR attempts >= ? THEN 'dead' ELSE 'ready' END,
+                lease_until = NULL,
+                available_at = ?,
+                error = ?,
+                updated_at = ?
+            WHERE key = ? AND worker = ? AND status = 'leased'
+            """,
+            (not retry, self.attempts, now + delay, error, now, key, worker),
+        )
+        self.conn.commit()
+
+
+    def retry_dead(self):
+        """Give every dead job a fresh set of attempts"""
+
+        cursor = self.conn.execute(
+            """
+            UPDATE jobs SET status = 'ready', attempts = 0, available_at = ?, updated_at = ?
+            WHERE status = 'dead'
+            """,
+            (time.time(), time.time()),
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+
+    def pending(self):
+        """Return how many jobs are ready or leased"""
+
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('ready', 'leased')"
+        ).fetchone()[0]
+
+
+    def stats(self):
+        """Return {status: job count}"""
+
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+
+
+    def leases(self):
+        """Return the jobs currently leased, soonest to expire first"""
+
+        return self.conn.execute(
+            "SELECT url, worker, attempts, lease_until FROM jobs WHERE status = 'leased' ORDER BY lease_until"
+        ).fetchall()
+
+
+async def keep_lease(queue, job, worker):
+    """Renew a job's lease until cancelled, so a long application isn't redelivered"""
+
+    while True:
+        await asyncio.sleep(queue.lease / 3)
+        if not await queue.call(queue.renew, job['key'], worker):
+            print(f"{worker} lost the lease on {job['url']}, it may be redelivered")
+            return
+
+
+async def consume(worker, forever=False):
+    """Claim jobs and run their application flow until the queue is drained"""
+
+    import apply_pw
+    from browser_pool import ContextPool
+    from export_store import ExportStore
+    from playwright.async_api import async_playwright
+    from throttle import limiter
+
+    with WorkQueue() as queue, ExportStore() as store:
+        async with async_playwright() as playwright:
+            async with ContextPool(playwright, size=1, headers=apply_pw.page_headers) as pool:
+                while True:
+                    job = await queue.call(queue.claim, worker)
+                    if job is None:
+                        # leased jobs may still come back if their worker dies
+                        if not forever and await queue.call(queue.pending) == 0:
+                            break
+                        await asyncio.sleep(poll_interval)
+                        continue
+
+                    url = job['url']
+                    print(f"{worker} claimed {url} (attempt {job['attempts']})")
+                    keeper = asyncio.create_task(keep_lease(queue, job, worker))
+                    try:
+                        status = await apply_pw.apply(playwright, pool, store, url)
+                    finally:
+                        keeper.cancel()
+
+                    if status == 'applied':
+                        await queue.call(queue.ack, job['key'], worker)
+                    elif status in retry_statuses:
+                        error = store.application(url)['error'] or status
+                        await queue.call(queue.fail, job['key'], worker, error, delay=limiter.backoff(job['attempts'] - 1))
+                    else:
+                        # filling it again changes nothing until SUBMIT is on (`status --retry`)
+                        await queue.call(queue.fail, job['key'], worker, status, retry=False)
+
+    print(f"{worker} done")
+
+
+def work(forever=False):
+    """Worker process entry point"""
+
+    # unique across every host sharing the queue
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    asyncio.run(consume(worker, forever))
+
+
+def start_workers(workers=queue_workers, forever=False):
+    """Run `workers` worker processes, each with its own browser, until they finish"""
+
+    # spawn, not fork: each worker starts its own playwright driver and event loop
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=work, args=(forever,)) for _ in range(max(1, workers))]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # whatever they had leased is redelivered once the leases run out
+        for process in processes:
+            process.terminate()
+
+
+def publish_export(export=None, new=False):
+    """Queue every exported listing not applied to yet, returning how many were added"""
+
+    from apply_pw import pending_urls
+    from export_store import ExportStore
+    from export_stream import read_export
+
+    with ExportStore() as store, WorkQueue() as queue:
+        done = store.applied()
+        if export:
+            records = list(read_export(export))
+        else:
+            since = store.last_run() if new else None
+            records = [dict(row) for row in store.not_applied(since=since)]
+
+        pending = set(pending_urls(records, done))
+        records = [record for record in records if record['url'] in pending]
+        added = queue.publish(records)
+        print(f"Queued {added} new listings ({queue.pending()} waiting) in {queue_path}")
+        return added
+
+
+def print_status(retry=False):
+    """Print job counts by status and the current leases, first requeueing dead jobs if `retry`"""
+
+    with WorkQueue() as queue:
+        if retry:
+            print(f"Requeued {queue.retry_dead()} dead jobs")
+        print(', '.join(f"{status}: {n}" for status, n in sorted(queue.stats().items())) or "Queue is empty")
+        now = time.time()
+        for row in queue.leases():
+            print(f"  {row['worker']} has {row['url']} (attempt {row['attempts']}, {row['lease_until'] - now:.0f}s left)")